@@ -0,0 +1,38 @@
+import threading
+
+
+class WeeklyAggregates:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.totals = {}
+        self.user_totals = {}
+
+    def add(self, user_id, day_of_week, sleep_hours):
+        with self.lock:
+            self._add(self.totals, day_of_week, sleep_hours, 1)
+            self._add(self.user_totals.setdefault(user_id, {}), day_of_week, sleep_hours, 1)
+
+    @staticmethod
+    def _add(totals, day_of_week, sleep_hours, count):
+        day = totals.get(day_of_week)
+        if day is None:
+            totals[day_of_week] = [sleep_hours, count]
+        else:
+            day[0] += sleep_hours
+            day[1] += count
+
+    def rebuild(self, storage):
+        totals = {}
+        user_totals = {}
+        for user_id, day_of_week, sleep_hours, count in storage.weekly_totals():
+            self._add(totals, day_of_week, sleep_hours, count)
+            self._add(user_totals.setdefault(user_id, {}), day_of_week, sleep_hours, count)
+
+        with self.lock:
+            self.totals = totals
+            self.user_totals = user_totals
+
+    def get(self, user_id=None):
+        with self.lock:
+            totals = self.totals if user_id is None else self.user_totals.get(user_id, {})
+            return {day: (hours, count) for day, (hours, count) in totals.items()}
@@ -0,0 +1,118 @@
+from datetime import datetime
+from numbers import Real
+
+import numpy as np
+
+from common import vectorized
+from metrics import timed
+from timestamps import parse_datetime, parse_many
+
+MAX_USER_ID = 2 ** 63 - 1
+
+
+def get_weekday_name(dt):
+    if not dt:
+        return "Неизвестно"
+    days = [
+        "Понедельник", "Вторник", "Среда", "Четверг",
+        "Пятница", "Суббота", "Воскресенье"
+    ]
+    return days[dt.weekday()]
+
+
+def check_sleep_times(data):
+    if not isinstance(data, dict) or 'start_time' not in data or 'end_time' not in data:
+        raise ValueError('start_time и end_time обязательны')
+
+
+def check_user_id(user_id):
+    if isinstance(user_id, bool) or not isinstance(user_id, int) or not -MAX_USER_ID - 1 <= user_id <= MAX_USER_ID:
+        raise ValueError('Некорректный user_id')
+    return user_id
+
+
+def check_habits(data):
+    habits = data.get('digital_habits') or {}
+    if not isinstance(habits, dict):
+        raise ValueError('digital_habits должен быть объектом')
+    screen_time = habits.get('screen_time_minutes', 0)
+    if isinstance(screen_time, bool) or not isinstance(screen_time, Real):
+        raise ValueError('Некорректное экранное время')
+    return habits
+
+
+def make_record(data, start_dt, duration_hours, analysis, recommendations):
+    return {
+        'user_id': data.get('user_id', 1),
+        'start_time': data['start_time'],
+        'end_time': data['end_time'],
+        'day_of_week': get_weekday_name(start_dt),
+        'sleep_hours': duration_hours,
+        'analysis': analysis,
+        'recommendations': recommendations,
+        'timestamp': datetime.now().isoformat()
+    }
+
+
+def build_record(data):
+    built = build_records([data])[0]
+    if isinstance(built, ValueError):
+        raise built
+    return built
+
+
+def build_records(items):
+    results = [None] * len(items)
+    candidates = []
+
+    for i, data in enumerate(items):
+        try:
+            check_sleep_times(data)
+        except ValueError as e:
+            results[i] = e
+            continue
+        candidates.append((i, data))
+
+    with timed('parse_datetime'):
+        start_dts, starts, start_aware = parse_many([data['start_time'] for i, data in candidates])
+        end_dts, ends, end_aware = parse_many([data['end_time'] for i, data in candidates])
+    valid = ~np.isnat(starts) & ~np.isnat(ends) & (start_aware == end_aware) & (starts < ends)
+    elapsed = (ends.view(np.int64) - starts.view(np.int64)) / 1e6
+    durations = vectorized.round_half_even(np.where(valid, elapsed, 0) / 3600, 2).tolist()
+    valid = valid.tolist()
+
+    parsed = []
+    for j, (i, data) in enumerate(candidates):
+        try:
+            if not valid[j]:
+                raise ValueError('Некорректное время сна')
+            check_user_id(data.get('user_id', 1))
+            habits = check_habits(data)
+        except ValueError as e:
+            results[i] = e
+            continue
+        parsed.append((i, data, habits, start_dts[j], durations[j]))
+
+    if not parsed:
+        return results
+
+    with timed('analysis'):
+        scores = vectorized.score_records(
+            [item[4] for item in parsed],
+            [item[2].get('screen_time_minutes', 0) for item in parsed]
+        )
+    quality_scores = scores['quality_score'].tolist()
+    codes = scores['recommendation_codes'].tolist()
+
+    for j, (i, data, habits, start_dt, duration_hours) in enumerate(parsed):
+        analysis = {
+            'duration_hours': duration_hours,
+            'quality_score': quality_scores[j],
+            'screen_time': habits.get('screen_time_minutes', 0),
+            'social_media_time': habits.get('social_media_minutes', 0),
+            'gaming_time': habits.get('gaming_minutes', 0)
+        }
+        recommendations = vectorized.record_recommendations(codes[j])
+        results[i] = (make_record(data, start_dt, duration_hours, analysis, recommendations), start_dt)
+
+    return results
@@ -1,31 +1,122 @@
-from flask import Flask, render_template, jsonify, request
+from flask import Flask, Response, render_template, request, g, stream_with_context
 from flask_cors import CORS
-from datetime import datetime
+import json
 import os
+import sys
+import threading
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from aggregates import WeeklyAggregates
+from dedup import DedupIndex, idempotency_key, natural_key
+import metrics
+from analysis import build_record, build_records
+from export import EXPORT_FORMATS, parquet_available
+from jobs import JobQueue
+from metrics import timed
+from recommendations import HISTORY_LIMIT, RULES_VERSION, history_recommendations
+from response_cache import ResponseCache, WriteVersions
+from serialization import SERIALIZER, RecordBytes, dumps, dumps_with_raw, join_array, json_response
+from storage import create_storage
+from sync import DELTA_LIMIT, gzip_response, parse_sync_request, read_json_body, sync_key, sync_record
+import timestamps
+from timestamps import to_epoch
+from trends import (DEFAULT_REGULARITY_DAYS, DEFAULT_WINDOW, date_range, day_bounds, population_regularity,
+                    query_bounds, rolling_trends, trend_range)
+from user_index import UserIndex, RECENT_LIMIT
 
 app = Flask(__name__, template_folder='templates', static_folder='static')
 CORS(app)
 
-sleep_records = []
+BASE_DIR = os.path.dirname(os.path.abspath(__file__))
+storage = create_storage(os.environ.get('SLEEP_STORAGE', os.path.join(BASE_DIR, 'sleep_records.db')))
+weekly_aggregates = WeeklyAggregates()
+weekly_aggregates.rebuild(storage)
+user_index = UserIndex()
+user_index.rebuild(storage)
+dedup_index = DedupIndex(storage)
+write_versions = WriteVersions()
+response_cache = ResponseCache(write_versions)
+record_bytes = RecordBytes()
+recommendation_queue = JobQueue('recommendations', workers=int(os.environ.get('SLEEP_JOB_WORKERS', 2)))
+
+metrics.registry.register(metrics.Gauge('sleep_records', 'Количество записей сна', user_index.total))
+metrics.registry.register(metrics.Gauge('sleep_users', 'Количество пользователей', user_index.user_count))
+metrics.registry.register(metrics.Gauge(
+    'sleep_jobs_pending', 'Задачи пересчета рекомендаций в очереди', recommendation_queue.depth
+))
+metrics.registry.register(metrics.Gauge(
+    'sleep_timestamp_cache_hits', 'Попадания в кэш разбора времени', timestamps.cache_hits
+))
+metrics.registry.register(metrics.Gauge(
+    'sleep_timestamp_cache_misses', 'Промахи кэша разбора времени', timestamps.cache_misses
+))
 
-def parse_datetime(dt_str):
-    if not dt_str:
-        return None
+MAX_PAGE_SIZE = 100
+MAX_BATCH_SIZE = 10000
+NDJSON_TYPES = ('application/x-ndjson', 'application/jsonl')
+ingest_lock = threading.Lock()
+
+def index_record(record):
+    weekly_aggregates.add(record['user_id'], record['day_of_week'], record['sleep_hours'])
+    user_index.add(record)
+    write_versions.bump(record['user_id'])
+    recommendation_queue.submit(record['id'], compute_insights, record)
     try:
-        if 'Z' in dt_str:
-            dt_str = dt_str.replace('Z', '+00:00')
-        return datetime.fromisoformat(dt_str)
-    except ValueError:
-        return None
-
-def get_weekday_name(dt):
-    if not dt:
-        return "Неизвестно"
-    days = [
-        "Понедельник", "Вторник", "Среда", "Четверг",
-        "Пятница", "Суббота", "Воскресенье"
-    ]
-    return days[dt.weekday()]
+        record_bytes.put(record)
+    except (TypeError, ValueError):
+        app.logger.exception('Не удалось сериализовать запись %s', record['id'])
+
+def current_insights(record_id):
+    insights = storage.get_insights(record_id)
+    if insights is not None and insights.get('rules_version') == RULES_VERSION:
+        return insights
+    return None
+
+def recommendations_status(record):
+    if current_insights(record['id']) is not None:
+        return 'ready'
+    recommendation_queue.submit(record['id'], compute_insights, record)
+    return 'pending'
+
+def compute_insights(record):
+    history_ids, _ = user_index.page(record['user_id'], before=record['id'] + 1, limit=HISTORY_LIMIT)
+    history = storage.get_many(history_ids)
+    storage.save_insights(record['id'], history_recommendations(record, history))
+
+def read_batch():
+    if request.mimetype in NDJSON_TYPES:
+        items = []
+        for line in request.stream:
+            line = line.strip()
+            if not line:
+                continue
+            if len(items) > MAX_BATCH_SIZE:
+                break
+            try:
+                items.append(json.loads(line))
+            except ValueError:
+                items.append(None)
+        return items
+
+    data = request.get_json(silent=True)
+    if isinstance(data, dict):
+        data = data.get('records')
+    return data if isinstance(data, list) else None
+
+@app.before_request
+def start_request_timer():
+    g.request_started = time.perf_counter()
+
+@app.after_request
+def record_request_metrics(response):
+    started = g.pop('request_started', None)
+    if started is not None:
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        metrics.request_duration.observe(time.perf_counter() - started, route, request.method)
+        metrics.requests_total.inc(route, request.method, str(response.status_code))
+    return response
 
 @app.route('/')
 def index():
@@ -33,89 +124,325 @@ def index():
 
 @app.route('/api/health')
 def health():
-    return jsonify({
+    return json_response({
         'status': 'ok',
-        'records': len(sleep_records)
+        'records': user_index.total(),
+        'serializer': SERIALIZER
+    })
+
+@app.route('/api/metrics')
+def metrics_endpoint():
+    return Response(metrics.registry.render(), mimetype='text/plain; version=0.0.4')
+
+def replay_record(keys, existing):
+    request_key, data_key = keys
+    if request_key in existing and existing.get(data_key) != existing[request_key]:
+        return json_response({
+            'status': 'error',
+            'message': 'Idempotency-Key уже использован для другой записи'
+        }), 422
+
+    record = storage.get(existing.get(request_key) or existing[data_key])
+    response = sleep_response(record, recommendations_status(record))
+    response.headers['Idempotent-Replayed'] = 'true'
+    return response
+
+def sleep_response(record, status='pending'):
+    return json_response({
+        'status': 'success',
+        'record_id': record['id'],
+        'day_of_week': record['day_of_week'],
+        'sleep_hours': record['sleep_hours'],
+        'analysis': record['analysis'],
+        'recommendations': record['recommendations'],
+        'recommendations_status': status
     })
 
 @app.route('/api/sleep', methods=['POST'])
 def save_sleep():
-    data = request.get_json()
+    data = request.get_json(silent=True)
 
-    if not data or 'start_time' not in data or 'end_time' not in data:
-        return jsonify({
+    try:
+        keys = (idempotency_key(request.headers.get('Idempotency-Key')), natural_key(data))
+    except ValueError as e:
+        return json_response({
             'status': 'error',
-            'message': 'start_time и end_time обязательны'
+            'message': str(e)
         }), 400
 
-    start_dt = parse_datetime(data['start_time'])
-    end_dt = parse_datetime(data['end_time'])
+    existing = dedup_index.lookup(keys)
+    if existing:
+        return replay_record(keys, existing)
 
-    if not start_dt or not end_dt or start_dt >= end_dt:
-        return jsonify({
+    try:
+        record, start_dt = build_record(data)
+    except ValueError as e:
+        return json_response({
             'status': 'error',
-            'message': 'Некорректное время сна'
+            'message': str(e)
         }), 400
 
-    duration_hours = round((end_dt - start_dt).total_seconds() / 3600, 2)
-
-    habits = data.get('digital_habits', {})
-    screen_time = habits.get('screen_time_minutes', 0)
-    social_time = habits.get('social_media_minutes', 0)
-    gaming_time = habits.get('gaming_minutes', 0)
-
-    quality_score = max(0, min(100, 100 - screen_time * 0.25))
-
-    recommendations = []
-    if screen_time > 120:
-        recommendations.append('Сократите экранное время перед сном')
-    if duration_hours < 6.5:
-        recommendations.append('Сон короче нормы, увеличьте продолжительность')
-    if not recommendations:
-        recommendations.append('Привычки нормальные')
-
-    record = {
-        'id': len(sleep_records) + 1,
-        'user_id': data.get('user_id', 1),
-        'start_time': data['start_time'],
-        'end_time': data['end_time'],
-        'day_of_week': get_weekday_name(start_dt),
-        'sleep_hours': duration_hours,
-        'analysis': {
-            'duration_hours': duration_hours,
-            'quality_score': round(quality_score, 1),
-            'screen_time': screen_time,
-            'social_media_time': social_time,
-            'gaming_time': gaming_time
-        },
-        'recommendations': recommendations,
-        'timestamp': datetime.now().isoformat()
-    }
-
-    sleep_records.append(record)
-
-    return jsonify({
+    with ingest_lock:
+        existing = dedup_index.lookup(keys)
+        if not existing:
+            with timed('storage'):
+                record = storage.add(record, to_epoch(start_dt), [key for key in keys if key])
+    if existing:
+        return replay_record(keys, existing)
+
+    dedup_index.remember((key, record['id']) for key in keys if key)
+    index_record(record)
+    return sleep_response(record)
+
+@app.route('/api/sleep/batch', methods=['POST'])
+def save_sleep_batch():
+    items = read_batch()
+    if items is None:
+        return json_response({
+            'status': 'error',
+            'message': 'Ожидается массив записей или NDJSON'
+        }), 400
+
+    if len(items) > MAX_BATCH_SIZE:
+        return json_response({
+            'status': 'error',
+            'message': f'Слишком много записей (максимум {MAX_BATCH_SIZE})'
+        }), 413
+
+    keys = [natural_key(item) for item in items]
+    existing = dedup_index.lookup(keys)
+
+    results = [None] * len(items)
+    first_index = {}
+    fresh = []
+    for i, key in enumerate(keys):
+        if key in existing:
+            results[i] = {'index': i, 'status': 'duplicate', 'record_id': existing[key]}
+        elif key not in first_index:
+            if key is not None:
+                first_index[key] = i
+            fresh.append(i)
+
+    valid = []
+    for i, built in zip(fresh, build_records([items[i] for i in fresh])):
+        if isinstance(built, ValueError):
+            results[i] = {'index': i, 'status': 'error', 'message': str(built)}
+            continue
+        record, start_dt = built
+        valid.append((i, record, to_epoch(start_dt)))
+
+    with ingest_lock:
+        existing = dedup_index.lookup([keys[i] for i, _, _ in valid])
+        new = [(i, record, start_ts) for i, record, start_ts in valid if keys[i] not in existing]
+        with timed('storage'):
+            records = storage.add_many([(record, start_ts) for _, record, start_ts in new],
+                                       [[keys[i]] if keys[i] else [] for i, _, _ in new])
+
+    dedup_index.remember((keys[i], record['id']) for (i, _, _), record in zip(new, records) if keys[i])
+    for (i, _, _), record in zip(new, records):
+        index_record(record)
+        results[i] = {'index': i, 'status': 'success', 'record_id': record['id']}
+
+    for i, result in enumerate(results):
+        if result is not None:
+            continue
+        if keys[i] in existing:
+            results[i] = {'index': i, 'status': 'duplicate', 'record_id': existing[keys[i]]}
+            continue
+        first = results[first_index[keys[i]]]
+        if first['status'] == 'error':
+            results[i] = dict(first, index=i)
+        else:
+            results[i] = {'index': i, 'status': 'duplicate', 'record_id': first['record_id']}
+
+    return json_response({
         'status': 'success',
-        'record_id': record['id'],
-        'day_of_week': record['day_of_week'],
-        'sleep_hours': duration_hours,
-        'analysis': record['analysis'],
-        'recommendations': recommendations
+        'accepted': len(records),
+        'duplicates': sum(1 for r in results if r['status'] == 'duplicate'),
+        'rejected': sum(1 for r in results if r['status'] == 'error'),
+        'results': results
     })
 
+@app.route('/api/sync', methods=['POST'])
+def sync():
+    try:
+        device_id, user_id, cursor, uploads = parse_sync_request(read_json_body(request))
+    except ValueError as e:
+        return json_response({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    if len(uploads) > MAX_BATCH_SIZE:
+        return json_response({
+            'status': 'error',
+            'message': f'Слишком много записей (максимум {MAX_BATCH_SIZE})'
+        }), 413
+
+    accepted = []
+    rejected = []
+    keyed = {}
+    for i, payload in enumerate(uploads):
+        try:
+            keyed.setdefault(sync_key(device_id, payload), payload)
+        except ValueError as e:
+            rejected.append({'index': i, 'message': str(e)})
+
+    with timed('storage'):
+        known = storage.sync_keys(list(keyed))
+    accepted.extend(known)
+
+    items = []
+    for key, payload in keyed.items():
+        if key in known:
+            continue
+        try:
+            items.append((key, payload, sync_record(user_id, payload)))
+        except ValueError as e:
+            rejected.append({'key': key, 'message': str(e)})
+
+    valid = []
+    for (key, payload, data), built in zip(items, build_records([data for _, _, data in items])):
+        if isinstance(built, ValueError):
+            rejected.append({'key': key, 'message': str(built)})
+            continue
+        record, start_dt = built
+        valid.append((key, payload, record, to_epoch(start_dt), natural_key(data)))
+
+    with ingest_lock:
+        known = storage.sync_keys([item[0] for item in valid])
+        pending = [item for item in valid if item[0] not in known]
+        existing = dedup_index.lookup([item[4] for item in pending])
+        new = []
+        claimed = set(existing)
+        for item in pending:
+            if item[4] not in claimed:
+                claimed.add(item[4])
+                new.append(item)
+        with timed('storage'):
+            records = storage.add_many([(record, start_ts) for _, _, record, start_ts, _ in new],
+                                       [[natural] for _, _, _, _, natural in new])
+            existing.update((item[4], record['id']) for item, record in zip(new, records))
+            storage.add_sync([(key, user_id, device_id, existing[natural], payload)
+                              for key, payload, _, _, natural in pending])
+    accepted.extend(known)
+
+    dedup_index.remember((item[4], record['id']) for item, record in zip(new, records))
+    for record in records:
+        index_record(record)
+    accepted.extend(item[0] for item in pending)
+
+    with timed('storage'):
+        rows = storage.sync_since(user_id, cursor, DELTA_LIMIT)
+
+    body = dumps({
+        'status': 'success',
+        'accepted': accepted,
+        'rejected': rejected,
+        'records': [payload for _, origin, payload in rows if origin != device_id],
+        'cursor': rows[-1][0] if rows else cursor,
+        'more': len(rows) == DELTA_LIMIT
+    })
+    body, headers = gzip_response(body, request)
+    return Response(body, mimetype='application/json', headers=headers)
+
+@app.route('/api/sleep/<int:record_id>/recommendations')
+def get_recommendations(record_id):
+    insights = current_insights(record_id)
+    if insights is not None:
+        return json_response({'status': 'success', 'record_id': record_id, **insights})
+
+    record = storage.get(record_id)
+    if record is None:
+        return json_response({
+            'status': 'error',
+            'message': 'Запись не найдена'
+        }), 404
+
+    recommendation_queue.submit(record_id, compute_insights, record)
+    return json_response({'status': 'pending', 'record_id': record_id}), 202
+
 @app.route('/api/sleep/user/<int:user_id>')
+@response_cache.cached()
 def get_user_history(user_id):
-    user_records = [r for r in sleep_records if r.get('user_id') == user_id]
-    return jsonify({
+    before = request.args.get('before', type=int)
+    limit = request.args.get('limit', RECENT_LIMIT, type=int)
+    limit = max(1, min(limit, MAX_PAGE_SIZE))
+
+    if before is None and limit <= RECENT_LIMIT:
+        with timed('storage'):
+            records = user_index.latest(storage, user_id, limit)
+        next_before = records[0]['id'] if records and user_index.count(user_id) > len(records) else None
+        records = record_bytes.encode(records)
+    else:
+        record_ids, next_before = user_index.page(user_id, before=before, limit=limit)
+        with timed('storage'):
+            records = record_bytes.fetch(record_ids, storage)
+
+    body = dumps_with_raw({
+        'status': 'success',
+        'records_count': user_index.count(user_id),
+        'next_before': next_before
+    }, {'records': join_array(records)})
+    return Response(body, mimetype='application/json')
+
+@app.route('/api/sleep/user/<int:user_id>/export')
+def export_user_history(user_id):
+    export_format = request.args.get('format', 'ndjson')
+    if export_format not in EXPORT_FORMATS:
+        return json_response({
+            'status': 'error',
+            'message': f"Неизвестный формат, доступны: {', '.join(EXPORT_FORMATS)}"
+        }), 400
+
+    if export_format == 'parquet' and not parquet_available():
+        return json_response({
+            'status': 'error',
+            'message': 'Экспорт в parquet требует pyarrow'
+        }), 501
+
+    exporter, mimetype = EXPORT_FORMATS[export_format]
+    batches = storage.iter_user_records(user_id)
+    if export_format == 'ndjson':
+        batches = (record_bytes.encode(batch, remember=False) for batch in batches)
+    return Response(
+        stream_with_context(exporter(batches)),
+        mimetype=mimetype,
+        headers={'Content-Disposition': f'attachment; filename=sleep_user_{user_id}.{export_format}'}
+    )
+
+@app.route('/api/sleep/user/<int:user_id>/trends')
+@response_cache.cached(daily=True)
+def user_trends(user_id):
+    window = request.args.get('window', DEFAULT_WINDOW, type=int)
+    try:
+        first_day, last_day = trend_range(request.args.get('from'), request.args.get('to'), window)
+    except ValueError as e:
+        return json_response({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    with timed('storage'):
+        rows = storage.user_range(user_id, *query_bounds(first_day, last_day, window))
+    with timed('trends'):
+        trends = rolling_trends(rows, first_day, last_day, window)
+
+    return json_response({
         'status': 'success',
-        'records_count': len(user_records),
-        'records': user_records[-10:]
+        'user_id': user_id,
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'window': window,
+        **trends
     })
 
 @app.route('/api/sleep/stats/weekly')
+@response_cache.cached()
 def weekly_stats():
-    if not sleep_records:
-        return jsonify({'status': 'success', 'weekly_stats': []})
+    totals = weekly_aggregates.get(request.args.get('user_id', type=int))
+    if not totals:
+        return json_response({'status': 'success', 'weekly_stats': []})
 
     days_order = [
         "Понедельник", "Вторник", "Среда", "Четверг",
@@ -124,13 +451,12 @@ def weekly_stats():
 
     stats = []
     for day_name in days_order:
-        day_records = [r for r in sleep_records if r['day_of_week'] == day_name]
-        if day_records:
-            avg_hours = sum(r['sleep_hours'] for r in day_records) / len(day_records)
+        hours, count = totals.get(day_name, (0, 0))
+        if count:
             stats.append({
                 'day': day_name,
-                'avg_hours': round(avg_hours, 2),
-                'record_count': len(day_records)
+                'avg_hours': round(hours / count, 2),
+                'record_count': count
             })
         else:
             stats.append({
@@ -139,11 +465,46 @@ def weekly_stats():
                 'record_count': 0
             })
 
-    return jsonify({
+    return json_response({
         'status': 'success',
         'weekly_stats': stats
     })
 
+@app.route('/api/sleep/stats/regularity')
+@response_cache.cached(daily=True)
+def regularity_stats():
+    user_id = request.args.get('user_id', type=int)
+    try:
+        first_day, last_day = date_range(request.args.get('from'), request.args.get('to'), DEFAULT_REGULARITY_DAYS)
+    except ValueError as e:
+        return json_response({
+            'status': 'error',
+            'message': str(e)
+        }), 400
+
+    with timed('storage'):
+        rows = storage.sleep_times(*day_bounds(first_day, last_day), user_id=user_id)
+    with timed('regularity'):
+        users = population_regularity(rows)
+
+    return json_response({
+        'status': 'success',
+        'from': first_day.isoformat(),
+        'to': last_day.isoformat(),
+        'users': users
+    })
+
+def serve():
+    host = os.environ.get('SLEEP_HOST', '0.0.0.0')
+    port = int(os.environ.get('SLEEP_PORT', 5000))
+
+    if os.environ.get('SLEEP_SERVER', 'waitress') == 'dev':
+        app.run(debug=True, host=host, port=port, threaded=True)
+        return
+
+    from waitress import serve as waitress_serve
+    waitress_serve(app, host=host, port=port, threads=int(os.environ.get('SLEEP_THREADS', 8)))
+
 if __name__ == '__main__':
     os.makedirs('templates', exist_ok=True)
-    app.run(debug=True, host='0.0.0.0', port=5000)
+    serve()
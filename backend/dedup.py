@@ -0,0 +1,68 @@
+import threading
+from collections import OrderedDict
+
+import metrics
+
+CACHE_SIZE = 100000
+MAX_IDEMPOTENCY_KEY = 255
+
+dedup_hits = metrics.registry.register(metrics.Counter(
+    'sleep_dedup_hits_total', 'Повторные отправки, отвеченные по индексу', ('kind',)
+))
+
+
+def natural_key(data):
+    if not isinstance(data, dict):
+        return None
+    user_id = data.get('user_id', 1)
+    start_time = data.get('start_time')
+    end_time = data.get('end_time')
+    if not isinstance(start_time, str) or not isinstance(end_time, str):
+        return None
+    return f'n:{user_id}:{start_time}:{end_time}'
+
+
+def idempotency_key(value):
+    if not value:
+        return None
+    if len(value) > MAX_IDEMPOTENCY_KEY:
+        raise ValueError(f'Idempotency-Key длиннее {MAX_IDEMPOTENCY_KEY} символов')
+    return f'i:{value}'
+
+
+class DedupIndex:
+    def __init__(self, storage, cache_size=CACHE_SIZE):
+        self.storage = storage
+        self.cache_size = cache_size
+        self.lock = threading.Lock()
+        self.cache = OrderedDict()
+
+    def lookup(self, keys):
+        keys = [key for key in keys if key]
+        found = {}
+        missing = []
+        with self.lock:
+            for key in keys:
+                record_id = self.cache.get(key)
+                if record_id is None:
+                    missing.append(key)
+                else:
+                    self.cache.move_to_end(key)
+                    found[key] = record_id
+
+        if missing:
+            stored = self.storage.find_keys(missing)
+            self.remember(stored.items())
+            found.update(stored)
+
+        for key in found:
+            dedup_hits.inc('idempotency' if key.startswith('i:') else 'natural')
+        return found
+
+    def remember(self, pairs):
+        with self.lock:
+            for key, record_id in pairs:
+                self.cache[key] = record_id
+                self.cache.move_to_end(key)
+            while len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
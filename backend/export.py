@@ -0,0 +1,109 @@
+import csv
+import io
+import json
+
+from serialization import dumps
+
+RECORD_COLUMNS = ('id', 'user_id', 'start_time', 'end_time', 'day_of_week', 'sleep_hours', 'timestamp')
+ANALYSIS_COLUMNS = ('duration_hours', 'quality_score', 'screen_time', 'social_media_time', 'gaming_time')
+
+
+def flat_row(record):
+    analysis = record.get('analysis') or {}
+    row = [record.get(column) for column in RECORD_COLUMNS]
+    row += [analysis.get(column) for column in ANALYSIS_COLUMNS]
+    row.append(json.dumps(record.get('recommendations') or [], ensure_ascii=False))
+    return row
+
+
+def export_ndjson(batches):
+    for batch in batches:
+        yield b''.join((record if isinstance(record, bytes) else dumps(record)) + b'\n' for record in batch)
+
+
+def export_csv(batches):
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    writer.writerow(RECORD_COLUMNS + ANALYSIS_COLUMNS + ('recommendations',))
+
+    for batch in batches:
+        writer.writerows(flat_row(record) for record in batch)
+        yield buffer.getvalue().encode('utf-8')
+        buffer.seek(0)
+        buffer.truncate()
+
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class ChunkSink(io.RawIOBase):
+    def __init__(self):
+        self.chunks = []
+        self.position = 0
+
+    def writable(self):
+        return True
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        self.position += len(data)
+        return len(data)
+
+    def tell(self):
+        return self.position
+
+    def take(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def export_parquet(batches):
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+
+    schema = pa.schema([
+        ('id', pa.int64()),
+        ('user_id', pa.int64()),
+        ('start_time', pa.string()),
+        ('end_time', pa.string()),
+        ('day_of_week', pa.string()),
+        ('sleep_hours', pa.float64()),
+        ('timestamp', pa.string()),
+        ('duration_hours', pa.float64()),
+        ('quality_score', pa.float64()),
+        ('screen_time', pa.float64()),
+        ('social_media_time', pa.float64()),
+        ('gaming_time', pa.float64()),
+        ('recommendations', pa.list_(pa.string())),
+    ])
+
+    sink = ChunkSink()
+    writer = pq.ParquetWriter(sink, schema)
+    try:
+        for batch in batches:
+            rows = []
+            for record in batch:
+                row = dict(zip(RECORD_COLUMNS + ANALYSIS_COLUMNS, flat_row(record)))
+                row['recommendations'] = record.get('recommendations') or []
+                rows.append(row)
+            writer.write_table(pa.Table.from_pylist(rows, schema=schema))
+            yield sink.take()
+    finally:
+        writer.close()
+    yield sink.take()
+
+
+def parquet_available():
+    try:
+        import pyarrow.parquet
+    except ImportError:
+        return False
+    return True
+
+
+EXPORT_FORMATS = {
+    'csv': (export_csv, 'text/csv; charset=utf-8'),
+    'ndjson': (export_ndjson, 'application/x-ndjson'),
+    'parquet': (export_parquet, 'application/vnd.apache.parquet'),
+}
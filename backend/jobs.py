@@ -0,0 +1,49 @@
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import metrics
+
+logger = logging.getLogger(__name__)
+
+jobs_total = metrics.registry.register(metrics.Counter(
+    'sleep_jobs_total', 'Количество фоновых задач', ('queue', 'status')
+))
+
+
+class JobQueue:
+    def __init__(self, name, workers=2, max_pending=10000):
+        self.name = name
+        self.max_pending = max_pending
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=f'sleep-{name}')
+        self.lock = threading.Lock()
+        self.pending = set()
+
+    def submit(self, key, func, *args):
+        with self.lock:
+            if key in self.pending:
+                return True
+            if len(self.pending) >= self.max_pending:
+                jobs_total.inc(self.name, 'dropped')
+                return False
+            self.pending.add(key)
+        self.executor.submit(self.run, key, func, args)
+        return True
+
+    def run(self, key, func, args):
+        try:
+            with metrics.timed(f'job_{self.name}'):
+                func(*args)
+            jobs_total.inc(self.name, 'done')
+        except Exception:
+            jobs_total.inc(self.name, 'failed')
+            logger.exception('Ошибка фоновой задачи %s (%s)', self.name, key)
+        finally:
+            with self.lock:
+                self.pending.discard(key)
+
+    def depth(self):
+        return len(self.pending)
+
+    def shutdown(self, wait=True):
+        self.executor.shutdown(wait=wait)
@@ -0,0 +1,40 @@
+from datetime import datetime
+
+from common import regularity
+
+RULES_VERSION = 1
+HISTORY_LIMIT = 14
+TARGET_HOURS = 8
+
+
+def history_recommendations(record, history):
+    recommendations = list(record['recommendations'])
+    recent = history[-HISTORY_LIMIT:]
+
+    if len(recent) >= regularity.MIN_SAMPLES:
+        hours = [r['sleep_hours'] for r in recent]
+        avg_hours = sum(hours) / len(hours)
+        if avg_hours < 6.5:
+            recommendations.append(f'В среднем за {len(recent)} ночей сон короче нормы ({avg_hours:.1f} ч)')
+
+        debt = sum(max(0, TARGET_HOURS - h) for h in hours[-7:])
+        if debt > 5:
+            recommendations.append(f'Накоплен недосып: {debt:.1f} ч за последние ночи')
+
+        bedtimes = regularity.circular_stats(regularity.clock_minutes(r['start_time'] for r in recent))
+        if regularity.is_irregular(bedtimes['std'], bedtimes['count']):
+            recommendations.append('Нерегулярное время отхода ко сну')
+
+        screen = [r['analysis'].get('screen_time', 0) for r in recent]
+        if sum(1 for s in screen if s > 120) * 2 > len(screen):
+            recommendations.append('Экранное время перед сном стабильно высокое')
+
+    if len(recommendations) > 1 and 'Привычки нормальные' in recommendations:
+        recommendations.remove('Привычки нормальные')
+
+    return {
+        'recommendations': list(dict.fromkeys(recommendations)),
+        'history_records': len(recent),
+        'rules_version': RULES_VERSION,
+        'computed_at': datetime.now().isoformat()
+    }
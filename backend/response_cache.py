@@ -0,0 +1,95 @@
+import functools
+import threading
+import time
+from collections import OrderedDict
+from datetime import datetime, timezone
+
+from flask import Response, make_response, request
+
+import metrics
+
+MAX_ENTRIES = 1024
+MAX_BODY_BYTES = 1024 * 1024
+
+cache_requests = metrics.registry.register(metrics.Counter(
+    'sleep_response_cache_total', 'Обращения к кэшу ответов', ('endpoint', 'result')
+))
+
+
+class WriteVersions:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.total = 0
+        self.users = {}
+
+    def bump(self, user_id):
+        with self.lock:
+            self.total += 1
+            self.users[user_id] = self.users.get(user_id, 0) + 1
+
+    def get(self, user_id=None):
+        if user_id is None:
+            return self.total
+        return self.users.get(user_id, 0)
+
+
+class ResponseCache:
+    def __init__(self, versions, max_entries=MAX_ENTRIES):
+        self.versions = versions
+        self.max_entries = max_entries
+        self.epoch = format(time.time_ns(), 'x')
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def etag(self, user_id, daily):
+        scope = 'all' if user_id is None else f'u{user_id}'
+        tag = f'{self.epoch}-{scope}-{self.versions.get(user_id)}'
+        if daily:
+            tag += datetime.now(timezone.utc).strftime('-%Y%m%d')
+        return tag
+
+    def get(self, key, tag):
+        with self.lock:
+            entry = self.entries.get(key)
+            if entry is None or entry[0] != tag:
+                return None
+            self.entries.move_to_end(key)
+            return entry
+
+    def put(self, key, tag, body, mimetype):
+        if len(body) > MAX_BODY_BYTES:
+            return
+        with self.lock:
+            self.entries[key] = (tag, body, mimetype)
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def cached(self, daily=False):
+        def decorator(view):
+            @functools.wraps(view)
+            def wrapper(*args, **kwargs):
+                user_id = kwargs.get('user_id', request.args.get('user_id', type=int))
+                tag = self.etag(user_id, daily)
+
+                if request.if_none_match.contains(tag):
+                    cache_requests.inc(request.endpoint, 'not_modified')
+                    response = Response(status=304)
+                else:
+                    key = request.full_path
+                    entry = self.get(key, tag)
+                    if entry is not None:
+                        cache_requests.inc(request.endpoint, 'hit')
+                        response = Response(entry[1], mimetype=entry[2])
+                    else:
+                        cache_requests.inc(request.endpoint, 'miss')
+                        response = make_response(view(*args, **kwargs))
+                        if response.status_code != 200:
+                            return response
+                        self.put(key, tag, response.get_data(), response.mimetype)
+
+                response.set_etag(tag)
+                response.headers['Cache-Control'] = 'no-cache'
+                return response
+            return wrapper
+        return decorator
@@ -0,0 +1,107 @@
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from flask import Response
+
+RECORD_CACHE_SIZE = int(os.environ.get('SLEEP_RECORD_CACHE', 50000))
+
+
+def default(value):
+    if hasattr(value, 'item'):
+        return value.item()
+    if hasattr(value, 'tolist'):
+        return value.tolist()
+    raise TypeError(f'Object of type {type(value).__name__} is not JSON serializable')
+
+
+def stdlib_dumps(value):
+    return json.dumps(value, ensure_ascii=False, separators=(',', ':'), default=default).encode('utf-8')
+
+
+def load_dumps(name):
+    if name in ('auto', 'orjson'):
+        try:
+            import orjson
+        except ImportError:
+            if name == 'orjson':
+                raise
+        else:
+            options = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+            def orjson_dumps(value):
+                try:
+                    return orjson.dumps(value, default=default, option=options)
+                except TypeError:
+                    return stdlib_dumps(value)
+            return 'orjson', orjson_dumps
+    return 'stdlib', stdlib_dumps
+
+
+SERIALIZER, dumps = load_dumps(os.environ.get('SLEEP_JSON', 'auto'))
+
+
+def json_response(value, status=200, headers=None):
+    return Response(dumps(value), status=status, headers=headers, mimetype='application/json')
+
+
+def join_array(parts):
+    return b'[' + b','.join(parts) + b']'
+
+
+def dumps_with_raw(value, raw):
+    fields = b','.join(dumps(name) + b':' + body for name, body in raw.items())
+    body = dumps(value)
+    if not fields:
+        return body
+    return body[:-1] + (b',' if len(body) > 2 else b'') + fields + b'}'
+
+
+class RecordBytes:
+    def __init__(self, max_entries=RECORD_CACHE_SIZE):
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()
+
+    def put(self, record):
+        body = dumps(record)
+        self.remember([(record['id'], body)])
+        return body
+
+    def remember(self, pairs):
+        if not self.max_entries:
+            return
+        with self.lock:
+            for record_id, body in pairs:
+                self.entries[record_id] = body
+                self.entries.move_to_end(record_id)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+
+    def lookup(self, record_ids):
+        with self.lock:
+            return {record_id: self.entries[record_id] for record_id in record_ids if record_id in self.entries}
+
+    def encode(self, records, remember=True):
+        cached = self.lookup([record['id'] for record in records])
+        encoded = []
+        new = []
+        for record in records:
+            body = cached.get(record['id'])
+            if body is None:
+                body = dumps(record)
+                new.append((record['id'], body))
+            encoded.append(body)
+        if remember:
+            self.remember(new)
+        return encoded
+
+    def fetch(self, record_ids, storage):
+        cached = self.lookup(record_ids)
+        missing = [record_id for record_id in record_ids if record_id not in cached]
+        if missing:
+            loaded = [(record['id'], dumps(record)) for record in storage.get_many(missing)]
+            self.remember(loaded)
+            cached.update(loaded)
+        return [cached[record_id] for record_id in record_ids if record_id in cached]
@@ -0,0 +1,390 @@
+import bisect
+import json
+import sqlite3
+import threading
+
+
+class MemoryStorage:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.records = []
+        self.by_user = {}
+        self.user_starts = {}
+        self.insights = {}
+        self.sync_log = []
+        self.sync_index = {}
+        self.keys = {}
+
+    def _add(self, record, start_ts, keys):
+        record = dict(record, id=len(self.records) + 1)
+        for key in keys:
+            self.keys.setdefault(key, record['id'])
+        self.records.append(record)
+        self.by_user.setdefault(record['user_id'], []).append(record)
+
+        starts, by_start = self.user_starts.setdefault(record['user_id'], ([], []))
+        i = bisect.bisect_right(starts, start_ts)
+        starts.insert(i, start_ts)
+        by_start.insert(i, record)
+        return record
+
+    def add(self, record, start_ts, keys=()):
+        with self.lock:
+            return self._add(record, start_ts, keys)
+
+    def add_many(self, items, keys=None):
+        keys = keys or [()] * len(items)
+        with self.lock:
+            return [self._add(record, start_ts, record_keys)
+                    for (record, start_ts), record_keys in zip(items, keys)]
+
+    def find_keys(self, keys):
+        with self.lock:
+            return {key: self.keys[key] for key in keys if key in self.keys}
+
+    def get(self, record_id):
+        if 1 <= record_id <= len(self.records):
+            return self.records[record_id - 1]
+        return None
+
+    def get_many(self, record_ids):
+        return [self.records[record_id - 1] for record_id in record_ids
+                if 1 <= record_id <= len(self.records)]
+
+    def count(self):
+        return len(self.records)
+
+    def user_count(self, user_id):
+        return len(self.by_user.get(user_id, []))
+
+    def user_records(self, user_id, limit=None):
+        records = self.by_user.get(user_id, [])
+        if limit is not None:
+            return records[-limit:] if limit > 0 else []
+        return list(records)
+
+    def iter_user_records(self, user_id, batch_size=1000):
+        records = self.by_user.get(user_id, [])
+        end = len(records)
+        for i in range(0, end, batch_size):
+            yield records[i:min(i + batch_size, end)]
+
+    def user_record_ids(self):
+        for user_id, records in self.by_user.items():
+            for record in records:
+                yield user_id, record['id']
+
+    def user_range(self, user_id, start_ts, end_ts):
+        with self.lock:
+            starts, by_start = self.user_starts.get(user_id, ((), ()))
+            lo = bisect.bisect_left(starts, start_ts)
+            hi = bisect.bisect_left(starts, end_ts)
+            rows = []
+            for ts, record in zip(starts[lo:hi], by_start[lo:hi]):
+                analysis = record['analysis']
+                rows.append((record['start_time'], record['end_time'], ts, record['sleep_hours'],
+                             analysis.get('quality_score'), analysis.get('screen_time')))
+        return rows
+
+    def sleep_times(self, start_ts, end_ts, user_id=None):
+        with self.lock:
+            user_ids = list(self.user_starts) if user_id is None else [user_id]
+            rows = []
+            for uid in user_ids:
+                starts, by_start = self.user_starts.get(uid, ((), ()))
+                lo = bisect.bisect_left(starts, start_ts)
+                hi = bisect.bisect_left(starts, end_ts)
+                rows.extend((uid, r['start_time'], r['end_time']) for r in by_start[lo:hi])
+        return rows
+
+    def weekly_totals(self):
+        totals = {}
+        for record in self.records:
+            key = (record['user_id'], record['day_of_week'])
+            hours, count = totals.get(key, (0, 0))
+            totals[key] = (hours + record['sleep_hours'], count + 1)
+        return [(user_id, day, hours, count) for (user_id, day), (hours, count) in totals.items()]
+
+    def save_insights(self, record_id, insights):
+        self.insights[record_id] = insights
+
+    def get_insights(self, record_id):
+        return self.insights.get(record_id)
+
+    def sync_keys(self, keys):
+        with self.lock:
+            return {key: self.sync_index[key] for key in keys if key in self.sync_index}
+
+    def add_sync(self, entries):
+        with self.lock:
+            for key, user_id, device_id, record_id, payload in entries:
+                if key in self.sync_index:
+                    continue
+                self.sync_log.append((len(self.sync_log) + 1, user_id, device_id, record_id, payload))
+                self.sync_index[key] = record_id
+
+    def sync_since(self, user_id, cursor, limit):
+        rows = []
+        for seq, entry_user, device_id, _, payload in self.sync_log[max(cursor, 0):]:
+            if entry_user == user_id:
+                rows.append((seq, device_id, payload))
+                if len(rows) >= limit:
+                    break
+        return rows
+
+    def close(self):
+        pass
+
+
+class SQLiteStorage:
+    SCHEMA = [
+        '''CREATE TABLE IF NOT EXISTS sleep_records (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            user_id INTEGER NOT NULL,
+            start_time TEXT NOT NULL,
+            end_time TEXT NOT NULL,
+            start_ts REAL NOT NULL,
+            day_of_week TEXT NOT NULL,
+            sleep_hours REAL NOT NULL,
+            analysis TEXT NOT NULL,
+            recommendations TEXT NOT NULL,
+            timestamp TEXT NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_sleep_user ON sleep_records (user_id)',
+        'CREATE INDEX IF NOT EXISTS idx_sleep_day ON sleep_records (day_of_week)',
+        'CREATE INDEX IF NOT EXISTS idx_sleep_start ON sleep_records (start_ts)',
+        'CREATE INDEX IF NOT EXISTS idx_sleep_user_start ON sleep_records (user_id, start_ts)',
+        '''CREATE TABLE IF NOT EXISTS sleep_keys (
+            key TEXT PRIMARY KEY,
+            record_id INTEGER NOT NULL
+        ) WITHOUT ROWID''',
+        '''CREATE TABLE IF NOT EXISTS sleep_sync (
+            seq INTEGER PRIMARY KEY AUTOINCREMENT,
+            key TEXT NOT NULL UNIQUE,
+            user_id INTEGER NOT NULL,
+            device_id TEXT NOT NULL,
+            record_id INTEGER NOT NULL,
+            payload TEXT NOT NULL
+        )''',
+        'CREATE INDEX IF NOT EXISTS idx_sync_user_seq ON sleep_sync (user_id, seq)',
+        '''CREATE TABLE IF NOT EXISTS sleep_insights (
+            record_id INTEGER PRIMARY KEY REFERENCES sleep_records (id),
+            insights TEXT NOT NULL
+        )''',
+    ]
+
+    COLUMNS = ('id, user_id, start_time, end_time, day_of_week, sleep_hours, '
+               'analysis, recommendations, timestamp')
+
+    CHUNK_SIZE = 500
+
+    def __init__(self, path):
+        self.path = path
+        self.local = threading.local()
+        conn = self.connection()
+        with conn:
+            for statement in self.SCHEMA:
+                conn.execute(statement)
+
+    def connection(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is None:
+            conn = sqlite3.connect(self.path, timeout=30)
+            conn.execute('PRAGMA journal_mode=WAL')
+            conn.execute('PRAGMA synchronous=NORMAL')
+            self.local.conn = conn
+        return conn
+
+    @staticmethod
+    def row_to_record(row):
+        return {
+            'id': row[0],
+            'user_id': row[1],
+            'start_time': row[2],
+            'end_time': row[3],
+            'day_of_week': row[4],
+            'sleep_hours': row[5],
+            'analysis': json.loads(row[6]),
+            'recommendations': json.loads(row[7]),
+            'timestamp': row[8]
+        }
+
+    INSERT = ('INSERT INTO sleep_records (user_id, start_time, end_time, start_ts, day_of_week, '
+              'sleep_hours, analysis, recommendations, timestamp) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)')
+
+    @staticmethod
+    def record_to_row(record, start_ts):
+        return (
+            record['user_id'],
+            record['start_time'],
+            record['end_time'],
+            start_ts,
+            record['day_of_week'],
+            record['sleep_hours'],
+            json.dumps(record['analysis'], ensure_ascii=False),
+            json.dumps(record['recommendations'], ensure_ascii=False),
+            record['timestamp']
+        )
+
+    INSERT_KEY = 'INSERT OR IGNORE INTO sleep_keys (key, record_id) VALUES (?, ?)'
+
+    def add(self, record, start_ts, keys=()):
+        return self.add_many([(record, start_ts)], [keys])[0]
+
+    def add_many(self, items, keys=None):
+        keys = keys or [()] * len(items)
+        conn = self.connection()
+        records = []
+        with conn:
+            for (record, start_ts), record_keys in zip(items, keys):
+                cursor = conn.execute(self.INSERT, self.record_to_row(record, start_ts))
+                records.append(dict(record, id=cursor.lastrowid))
+                conn.executemany(self.INSERT_KEY, [(key, cursor.lastrowid) for key in record_keys])
+        return records
+
+    def find_keys(self, keys):
+        found = {}
+        for i in range(0, len(keys), self.CHUNK_SIZE):
+            chunk = keys[i:i + self.CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            found.update(self.connection().execute(
+                f'SELECT key, record_id FROM sleep_keys WHERE key IN ({placeholders})', chunk
+            ))
+        return found
+
+    def get(self, record_id):
+        row = self.connection().execute(
+            f'SELECT {self.COLUMNS} FROM sleep_records WHERE id = ?', (record_id,)
+        ).fetchone()
+        return self.row_to_record(row) if row else None
+
+    def get_many(self, record_ids):
+        records = []
+        for i in range(0, len(record_ids), self.CHUNK_SIZE):
+            chunk = record_ids[i:i + self.CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            rows = self.connection().execute(
+                f'SELECT {self.COLUMNS} FROM sleep_records WHERE id IN ({placeholders}) ORDER BY id',
+                chunk
+            ).fetchall()
+            records.extend(self.row_to_record(row) for row in rows)
+        return records
+
+    def count(self):
+        return self.connection().execute('SELECT COUNT(*) FROM sleep_records').fetchone()[0]
+
+    def user_count(self, user_id):
+        return self.connection().execute(
+            'SELECT COUNT(*) FROM sleep_records WHERE user_id = ?', (user_id,)
+        ).fetchone()[0]
+
+    def user_records(self, user_id, limit=None):
+        if limit is None:
+            rows = self.connection().execute(
+                f'SELECT {self.COLUMNS} FROM sleep_records WHERE user_id = ? ORDER BY id',
+                (user_id,)
+            ).fetchall()
+            return [self.row_to_record(row) for row in rows]
+
+        rows = self.connection().execute(
+            f'SELECT {self.COLUMNS} FROM sleep_records WHERE user_id = ? ORDER BY id DESC LIMIT ?',
+            (user_id, max(limit, 0))
+        ).fetchall()
+        return [self.row_to_record(row) for row in reversed(rows)]
+
+    def iter_user_records(self, user_id, batch_size=1000):
+        last_id = 0
+        while True:
+            rows = self.connection().execute(
+                f'SELECT {self.COLUMNS} FROM sleep_records WHERE user_id = ? AND id > ? ORDER BY id LIMIT ?',
+                (user_id, last_id, batch_size)
+            ).fetchall()
+            if not rows:
+                return
+            yield [self.row_to_record(row) for row in rows]
+            last_id = rows[-1][0]
+
+    def user_record_ids(self):
+        return self.connection().execute(
+            'SELECT user_id, id FROM sleep_records ORDER BY user_id, id'
+        )
+
+    def user_range(self, user_id, start_ts, end_ts):
+        return self.connection().execute(
+            "SELECT start_time, end_time, start_ts, sleep_hours, "
+            "json_extract(analysis, '$.quality_score'), json_extract(analysis, '$.screen_time') "
+            'FROM sleep_records WHERE user_id = ? AND start_ts >= ? AND start_ts < ? ORDER BY start_ts',
+            (user_id, start_ts, end_ts)
+        ).fetchall()
+
+    def sleep_times(self, start_ts, end_ts, user_id=None):
+        if user_id is not None:
+            return self.connection().execute(
+                'SELECT user_id, start_time, end_time FROM sleep_records '
+                'WHERE user_id = ? AND start_ts >= ? AND start_ts < ?',
+                (user_id, start_ts, end_ts)
+            ).fetchall()
+        return self.connection().execute(
+            'SELECT user_id, start_time, end_time FROM sleep_records WHERE start_ts >= ? AND start_ts < ?',
+            (start_ts, end_ts)
+        ).fetchall()
+
+    def weekly_totals(self):
+        return self.connection().execute(
+            'SELECT user_id, day_of_week, SUM(sleep_hours), COUNT(*) FROM sleep_records '
+            'GROUP BY user_id, day_of_week'
+        ).fetchall()
+
+    def save_insights(self, record_id, insights):
+        conn = self.connection()
+        with conn:
+            conn.execute(
+                'INSERT OR REPLACE INTO sleep_insights (record_id, insights) VALUES (?, ?)',
+                (record_id, json.dumps(insights, ensure_ascii=False))
+            )
+
+    def get_insights(self, record_id):
+        row = self.connection().execute(
+            'SELECT insights FROM sleep_insights WHERE record_id = ?', (record_id,)
+        ).fetchone()
+        return json.loads(row[0]) if row else None
+
+    def sync_keys(self, keys):
+        found = {}
+        for i in range(0, len(keys), self.CHUNK_SIZE):
+            chunk = keys[i:i + self.CHUNK_SIZE]
+            placeholders = ', '.join('?' * len(chunk))
+            found.update(self.connection().execute(
+                f'SELECT key, record_id FROM sleep_sync WHERE key IN ({placeholders})', chunk
+            ))
+        return found
+
+    def add_sync(self, entries):
+        conn = self.connection()
+        with conn:
+            conn.executemany(
+                'INSERT OR IGNORE INTO sleep_sync (key, user_id, device_id, record_id, payload) VALUES (?, ?, ?, ?, ?)',
+                [(key, user_id, device_id, record_id, json.dumps(payload, ensure_ascii=False))
+                 for key, user_id, device_id, record_id, payload in entries]
+            )
+
+    def sync_since(self, user_id, cursor, limit):
+        rows = self.connection().execute(
+            'SELECT seq, device_id, payload FROM sleep_sync WHERE user_id = ? AND seq > ? ORDER BY seq LIMIT ?',
+            (user_id, cursor, limit)
+        ).fetchall()
+        return [(seq, device_id, json.loads(payload)) for seq, device_id, payload in rows]
+
+    def close(self):
+        conn = getattr(self.local, 'conn', None)
+        if conn is not None:
+            conn.close()
+            self.local.conn = None
+
+
+def create_storage(url):
+    if not url or url in ('memory', ':memory:'):
+        return MemoryStorage()
+    if url.startswith('sqlite:///'):
+        url = url[len('sqlite:///'):]
+    return SQLiteStorage(url)
@@ -0,0 +1,80 @@
+import gzip
+import json
+import zlib
+from datetime import timedelta
+
+from analysis import check_user_id, parse_datetime
+
+MAX_SYNC_BYTES = 32 * 1024 * 1024
+DELTA_LIMIT = 500
+MAX_DEVICE_ID = 64
+GZIP_MIN_BYTES = 1024
+
+
+def read_json_body(request):
+    if (request.content_length or 0) > MAX_SYNC_BYTES:
+        raise ValueError(f'Слишком большой запрос (максимум {MAX_SYNC_BYTES} байт)')
+    body = request.get_data(cache=False)
+    if request.headers.get('Content-Encoding', '').lower() == 'gzip':
+        decompressor = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        try:
+            body = decompressor.decompress(body, MAX_SYNC_BYTES)
+        except zlib.error:
+            raise ValueError('Некорректное сжатие gzip')
+        if decompressor.unconsumed_tail:
+            raise ValueError(f'Слишком большой запрос (максимум {MAX_SYNC_BYTES} байт)')
+    try:
+        return json.loads(body)
+    except ValueError:
+        raise ValueError('Некорректный JSON')
+
+
+def parse_sync_request(data):
+    if not isinstance(data, dict):
+        raise ValueError('Ожидается JSON-объект')
+
+    device_id = data.get('device_id')
+    if not isinstance(device_id, str) or not 0 < len(device_id) <= MAX_DEVICE_ID or ':' in device_id:
+        raise ValueError('Некорректный device_id')
+
+    user_id = data.get('user_id', 1)
+    cursor = data.get('cursor', 0)
+    records = data.get('records', [])
+    check_user_id(user_id)
+    if isinstance(cursor, bool) or not isinstance(cursor, int) or cursor < 0:
+        raise ValueError('Некорректный cursor')
+    if not isinstance(records, list):
+        raise ValueError('records должен быть массивом')
+    return device_id, user_id, cursor, records
+
+
+def sync_key(device_id, record):
+    if not isinstance(record, dict) or not isinstance(record.get('timestamp'), str):
+        raise ValueError('У записи нет timestamp')
+    return f"{device_id}:{record['timestamp']}"
+
+
+def sync_record(user_id, record):
+    end_dt = parse_datetime(record.get('timestamp'))
+    hours = record.get('duration_hours', 0)
+    minutes = record.get('duration_minutes', 0)
+    if end_dt is None or any(isinstance(v, bool) or not isinstance(v, int) for v in (hours, minutes)):
+        raise ValueError('Некорректная запись сна')
+    minutes += hours * 60
+    if minutes <= 0:
+        raise ValueError('Некорректная запись сна')
+
+    start_dt = end_dt - timedelta(minutes=minutes)
+    habits = record.get('digital_habits')
+    return {
+        'user_id': user_id,
+        'start_time': start_dt.isoformat(),
+        'end_time': end_dt.isoformat(),
+        'digital_habits': habits if isinstance(habits, dict) else {}
+    }
+
+
+def gzip_response(body, request):
+    if len(body) < GZIP_MIN_BYTES or 'gzip' not in request.headers.get('Accept-Encoding', ''):
+        return body, {}
+    return gzip.compress(body, compresslevel=5), {'Content-Encoding': 'gzip', 'Vary': 'Accept-Encoding'}
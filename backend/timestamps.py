@@ -0,0 +1,57 @@
+import math
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+
+import numpy as np
+
+CACHE_SIZE = 65536
+EPOCH = datetime(1970, 1, 1)
+EPOCH_UTC = datetime(1970, 1, 1, tzinfo=timezone.utc)
+MICROSECOND = timedelta(microseconds=1)
+NAT = np.iinfo(np.int64).min
+
+
+@lru_cache(maxsize=CACHE_SIZE)
+def parse_cached(value):
+    if value[-1] == 'Z':
+        value = value[:-1] + '+00:00'
+    try:
+        dt = datetime.fromisoformat(value)
+    except ValueError:
+        return None
+    if dt.tzinfo is None:
+        return dt, (dt - EPOCH) // MICROSECOND, False
+    return dt, (dt - EPOCH_UTC) // MICROSECOND, True
+
+
+def parse(value):
+    if not value or not isinstance(value, str):
+        return None
+    return parse_cached(value)
+
+
+def parse_datetime(value):
+    parsed = parse(value)
+    return parsed[0] if parsed else None
+
+
+def to_epoch(dt):
+    if dt.tzinfo is None:
+        return math.floor(dt.timestamp())
+    return (dt - EPOCH_UTC) // timedelta(seconds=1)
+
+
+def parse_many(values):
+    parsed = [parse(value) for value in values]
+    micros = np.fromiter((NAT if p is None else p[1] for p in parsed), dtype=np.int64, count=len(parsed))
+    aware = np.fromiter((p is not None and p[2] for p in parsed), dtype=bool, count=len(parsed))
+    datetimes = [p[0] if p else None for p in parsed]
+    return datetimes, micros.view('datetime64[us]'), aware
+
+
+def cache_hits():
+    return parse_cached.cache_info().hits
+
+
+def cache_misses():
+    return parse_cached.cache_info().misses
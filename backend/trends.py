@@ -0,0 +1,179 @@
+from datetime import date, datetime, time, timedelta, timezone
+
+import numpy as np
+
+from analysis import parse_datetime
+from common import regularity
+
+DEFAULT_WINDOW = 7
+MAX_WINDOW = 365
+DEFAULT_RANGE_DAYS = 90
+DEFAULT_REGULARITY_DAYS = 28
+MAX_RANGE_DAYS = 3660
+
+TREND_METRICS = ('duration_hours', 'quality_score', 'screen_time')
+CLOCK_METRICS = ('bedtime', 'wake_time')
+
+
+def parse_day(value, name):
+    try:
+        return date.fromisoformat(value)
+    except (TypeError, ValueError):
+        raise ValueError(f'Некорректная дата {name}, ожидается ГГГГ-ММ-ДД')
+
+
+def date_range(date_from, date_to, default_days=DEFAULT_RANGE_DAYS):
+    last_day = parse_day(date_to, 'to') if date_to else datetime.now(timezone.utc).date()
+    first_day = parse_day(date_from, 'from') if date_from else last_day - timedelta(days=default_days - 1)
+
+    if first_day > last_day:
+        raise ValueError('Дата from позже даты to')
+    if (last_day - first_day).days + 1 > MAX_RANGE_DAYS:
+        raise ValueError(f'Слишком большой диапазон (максимум {MAX_RANGE_DAYS} дней)')
+    return first_day, last_day
+
+
+def trend_range(date_from, date_to, window):
+    first_day, last_day = date_range(date_from, date_to)
+    if not 1 <= window <= MAX_WINDOW:
+        raise ValueError(f'Окно должно быть от 1 до {MAX_WINDOW} дней')
+    return first_day, last_day
+
+
+def query_bounds(first_day, last_day, window):
+    start = datetime.combine(first_day - timedelta(days=window), time(), timezone.utc)
+    end = datetime.combine(last_day + timedelta(days=2), time(), timezone.utc)
+    return start.timestamp(), end.timestamp()
+
+
+def day_bounds(first_day, last_day):
+    start = datetime.combine(first_day, time(), timezone.utc)
+    end = datetime.combine(last_day + timedelta(days=1), time(), timezone.utc)
+    return start.timestamp(), end.timestamp()
+
+
+def local_clock(value):
+    if isinstance(value, str) and len(value) >= 16 and value[4] == '-' and value[13] == ':':
+        try:
+            return value[:10], int(value[11:13]) * 60 + int(value[14:16])
+        except ValueError:
+            pass
+    dt = parse_datetime(value)
+    if dt is None:
+        return None, None
+    return dt.date().isoformat(), dt.hour * 60 + dt.minute
+
+
+def rolling_sums(day_index, weights, days, window):
+    sums = np.zeros(days + 1)
+    sums[1:] = np.cumsum(np.bincount(day_index, weights=weights, minlength=days))
+    end = np.arange(1, days + 1)
+    return sums[end] - sums[np.maximum(end - window, 0)]
+
+
+def rolling_stats(day_index, values, days, window):
+    valid = ~np.isnan(values)
+    index = day_index[valid]
+    values = values[valid]
+
+    n = rolling_sums(index, np.ones(len(values)), days, window)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        mean = rolling_sums(index, values, days, window) / n
+        variance = rolling_sums(index, values * values, days, window) / n - mean * mean
+    return mean, np.sqrt(np.maximum(variance, 0)), n
+
+
+def rolling_circular(day_index, minutes, days, window):
+    valid = ~np.isnan(minutes)
+    index = day_index[valid]
+    angles = regularity.to_angles(minutes[valid])
+    return regularity.circular_from_sums(
+        rolling_sums(index, np.cos(angles), days, window),
+        rolling_sums(index, np.sin(angles), days, window),
+        rolling_sums(index, np.ones(len(angles)), days, window)
+    )
+
+
+def rounded(values):
+    return [None if np.isnan(v) else round(float(v), 2) for v in values]
+
+
+def rolling_trends(rows, first_day, last_day, window):
+    days = (last_day - first_day).days + window
+    origin = np.datetime64(first_day - timedelta(days=window - 1), 'D')
+
+    bed = [local_clock(row[0]) for row in rows]
+    wake = [local_clock(row[1])[1] for row in rows]
+    keep = [i for i, (day, _) in enumerate(bed) if day is not None]
+
+    day_index = (np.array([bed[i][0] for i in keep], dtype='datetime64[D]') - origin).astype(np.int64)
+    in_range = (day_index >= 0) & (day_index < days)
+    day_index = day_index[in_range]
+
+    def column(values):
+        return np.array(values, dtype=np.float64)[in_range]
+
+    columns = {
+        'duration_hours': column([rows[i][3] for i in keep]),
+        'quality_score': column([rows[i][4] for i in keep]),
+        'screen_time': column([rows[i][5] for i in keep]),
+        'bedtime': column([bed[i][1] for i in keep]),
+        'wake_time': column([wake[i] for i in keep]),
+    }
+
+    trends = {}
+    counts = None
+    for name in TREND_METRICS:
+        mean, std, n = rolling_stats(day_index, columns[name], days, window)
+        if counts is None:
+            counts = n[window - 1:]
+        trends[name] = {'mean': rounded(mean[window - 1:]), 'std': rounded(std[window - 1:])}
+
+    for name in CLOCK_METRICS:
+        stats = rolling_circular(day_index, columns[name], days, window)
+        trends[name] = {
+            'mean': rounded(stats['mean'][window - 1:]),
+            'std': rounded(stats['std'][window - 1:]),
+            'regularity': rounded(regularity.regularity_score(stats['std'], stats['count'])[window - 1:])
+        }
+
+    dates = np.arange(np.datetime64(first_day, 'D'), np.datetime64(last_day, 'D') + 1)
+    return {
+        'dates': [str(d) for d in dates],
+        'records': counts.astype(np.int64).tolist(),
+        'records_in_range': int(np.count_nonzero(day_index >= window - 1)),
+        'trends': trends
+    }
+
+
+def clock_summary(stats, i):
+    return {
+        'mean': regularity.format_clock(stats['mean'][i]),
+        'std_minutes': rounded(stats['std'][i:i + 1])[0],
+        'records': int(stats['count'][i])
+    }
+
+
+def population_regularity(rows):
+    rows = [row for row in rows if isinstance(row[0], int) and not isinstance(row[0], bool)]
+    user_ids = np.array([row[0] for row in rows], dtype=np.int64)
+    users, groups = np.unique(user_ids, return_inverse=True)
+
+    bed = regularity.grouped_circular_stats(groups, regularity.clock_minutes(row[1] for row in rows), len(users))
+    wake = regularity.grouped_circular_stats(groups, regularity.clock_minutes(row[2] for row in rows), len(users))
+    bed_score = regularity.regularity_score(bed['std'], bed['count'])
+    wake_score = regularity.regularity_score(wake['std'], wake['count'])
+    with np.errstate(invalid='ignore'):
+        scores = np.round((bed_score + wake_score) / 2)
+
+    return [
+        {
+            'user_id': int(user_id),
+            'bedtime': clock_summary(bed, i),
+            'wake_time': clock_summary(wake, i),
+            'regularity_score': rounded(scores[i:i + 1])[0],
+            'irregular_bedtime': bool(regularity.is_irregular(bed['std'][i], bed['count'][i])),
+            'irregular_wake_time': bool(regularity.is_irregular(wake['std'][i], wake['count'][i]))
+        }
+        for i, user_id in enumerate(users)
+    ]
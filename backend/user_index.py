@@ -0,0 +1,89 @@
+import bisect
+import threading
+from array import array
+from collections import deque
+
+RECENT_LIMIT = 10
+
+
+class UserIndex:
+    def __init__(self, recent_limit=RECENT_LIMIT):
+        self.lock = threading.Lock()
+        self.recent_limit = recent_limit
+        self.ids = {}
+        self.recent = {}
+        self.records_total = 0
+
+    def add(self, record):
+        user_id = record['user_id']
+        with self.lock:
+            ids = self.ids.get(user_id)
+            if ids is None:
+                ids = self.ids[user_id] = array('q')
+                self.recent[user_id] = deque(maxlen=self.recent_limit)
+
+            self.records_total += 1
+            if not ids or ids[-1] < record['id']:
+                ids.append(record['id'])
+            else:
+                ids.insert(bisect.bisect_left(ids, record['id']), record['id'])
+
+            recent = self.recent.get(user_id)
+            if recent is not None:
+                if not recent or recent[-1]['id'] < record['id']:
+                    recent.append(record)
+                else:
+                    del self.recent[user_id]
+
+    def rebuild(self, storage):
+        ids = {}
+        records_total = 0
+        for user_id, record_id in storage.user_record_ids():
+            user_ids = ids.get(user_id)
+            if user_ids is None:
+                user_ids = ids[user_id] = array('q')
+            user_ids.append(record_id)
+            records_total += 1
+
+        with self.lock:
+            self.ids = ids
+            self.recent = {}
+            self.records_total = records_total
+
+    def total(self):
+        return self.records_total
+
+    def user_count(self):
+        return len(self.ids)
+
+    def count(self, user_id):
+        with self.lock:
+            return len(self.ids.get(user_id, ()))
+
+    def latest(self, storage, user_id, limit):
+        with self.lock:
+            recent = self.recent.get(user_id)
+            if recent is not None:
+                return list(recent)[-limit:]
+            if user_id not in self.ids:
+                return []
+
+        records = storage.user_records(user_id, limit=self.recent_limit)
+        with self.lock:
+            ids = self.ids.get(user_id)
+            current = records and ids and records[-1]['id'] == ids[-1]
+            if current and user_id not in self.recent:
+                self.recent[user_id] = deque(records, maxlen=self.recent_limit)
+        return records[-limit:]
+
+    def page(self, user_id, before=None, limit=RECENT_LIMIT):
+        with self.lock:
+            ids = self.ids.get(user_id)
+            if not ids:
+                return [], None
+            end = len(ids) if before is None else bisect.bisect_left(ids, before)
+            start = max(0, end - limit)
+            page_ids = ids[start:end].tolist()
+
+        next_before = page_ids[0] if start > 0 and page_ids else None
+        return page_ids, next_before
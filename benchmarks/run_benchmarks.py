@@ -0,0 +1,211 @@
+import argparse
+import importlib
+import json
+import os
+import platform
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'mobile'))
+sys.path.insert(0, ROOT_DIR)
+
+from sleep_analysis import SleepPhaseAnalyzer, SleepAdvisor
+
+DEFAULT_SIZES = (1000, 100000, 1000000)
+CHUNK_SIZE = 10000
+
+
+def summarize(latencies, elapsed):
+    latencies = sorted(latencies)
+    count = len(latencies)
+    return {
+        'iterations': count,
+        'throughput_per_s': round(count / elapsed, 2) if elapsed > 0 else None,
+        'p50_ms': round(latencies[int(count * 0.50)] * 1000, 4),
+        'p99_ms': round(latencies[min(count - 1, int(count * 0.99))] * 1000, 4),
+        'max_ms': round(latencies[-1] * 1000, 4)
+    }
+
+
+def measure(func, iterations):
+    latencies = []
+    started = time.perf_counter()
+    for i in range(iterations):
+        t0 = time.perf_counter()
+        func(i)
+        latencies.append(time.perf_counter() - t0)
+    return summarize(latencies, time.perf_counter() - started)
+
+
+def measure_cached(func, iterations, endpoint):
+    from response_cache import cache_requests
+
+    before = dict(cache_requests.values)
+    result = measure(func, iterations)
+    after = dict(cache_requests.values)
+    result['cache'] = {
+        status: after.get((endpoint, status), 0) - before.get((endpoint, status), 0)
+        for status in ('hit', 'miss')
+    }
+    return result
+
+
+def synthetic_items(count, users, rng):
+    base = datetime(2025, 1, 1, 22, 0)
+    for i in range(count):
+        start = base + timedelta(days=i // users, minutes=rng.randint(-120, 120))
+        end = start + timedelta(minutes=rng.randint(240, 600))
+        yield {
+            'user_id': rng.randint(1, users),
+            'start_time': start.isoformat(),
+            'end_time': end.isoformat(),
+            'digital_habits': {
+                'screen_time_minutes': rng.randint(0, 300),
+                'social_media_minutes': rng.randint(0, 120),
+                'gaming_minutes': rng.randint(0, 120)
+            }
+        }
+
+
+def load_app(storage_url):
+    os.environ['SLEEP_STORAGE'] = storage_url
+    if 'app_simple' in sys.modules:
+        return importlib.reload(sys.modules['app_simple'])
+    return importlib.import_module('app_simple')
+
+
+def populate(app_module, size, users, rng):
+    from analysis import build_records
+    from timestamps import to_epoch
+
+    items = synthetic_items(size, users, rng)
+    started = time.perf_counter()
+    while True:
+        chunk = [item for _, item in zip(range(CHUNK_SIZE), items)]
+        if not chunk:
+            break
+        built = [(record, to_epoch(start_dt)) for record, start_dt in build_records(chunk)]
+        app_module.storage.add_many(built)
+    ingest_seconds = time.perf_counter() - started
+
+    started = time.perf_counter()
+    app_module.weekly_aggregates.rebuild(app_module.storage)
+    app_module.user_index.rebuild(app_module.storage)
+    rebuild_seconds = time.perf_counter() - started
+
+    return {
+        'ingest_s': round(ingest_seconds, 3),
+        'ingest_records_per_s': round(size / ingest_seconds, 2) if ingest_seconds > 0 else None,
+        'rebuild_s': round(rebuild_seconds, 3)
+    }
+
+
+def bench_endpoints(app_module, users, iterations, rng):
+    client = app_module.app.test_client()
+    payloads = list(synthetic_items(iterations, users, rng))
+    user_ids = [rng.randint(1, users) for _ in range(iterations)]
+
+    def check(response):
+        if response.status_code != 200:
+            raise RuntimeError(f'{response.request.path}: {response.status_code}')
+
+    def cached(endpoint, url):
+        return measure_cached(lambda i: check(client.get(url(i))), iterations, endpoint)
+
+    def uncached(endpoint, url):
+        def bypass(i):
+            path = url(i)
+            return f"{path}{'&' if '?' in path else '?'}nocache={i}"
+        return cached(endpoint, bypass)
+
+    history_url = lambda i: f'/api/sleep/user/{user_ids[i]}'
+    weekly_url = lambda i: '/api/sleep/stats/weekly'
+    trends_url = lambda i: f'/api/sleep/user/{user_ids[i]}/trends?from=2025-01-01&to=2025-12-31&window=7'
+
+    return {
+        'save_sleep': measure(lambda i: check(client.post('/api/sleep', json=payloads[i])), iterations),
+        'get_user_history': cached('get_user_history', history_url),
+        'get_user_history_uncached': uncached('get_user_history', history_url),
+        'weekly_stats': cached('weekly_stats', weekly_url),
+        'weekly_stats_uncached': uncached('weekly_stats', weekly_url),
+        'user_trends': cached('user_trends', trends_url),
+        'user_trends_uncached': uncached('user_trends', trends_url),
+        'health': measure(lambda i: check(client.get('/api/health')), iterations)
+    }
+
+
+def bench_analysis(iterations, rng):
+    random.seed(rng.random())
+    durations = [rng.randint(0, 720) for _ in range(iterations)]
+    phases = [SleepPhaseAnalyzer.generate_sleep_phases(d) for d in durations]
+    histories = []
+    for _ in range(iterations):
+        history = []
+        for _ in range(rng.randint(0, 14)):
+            history.append({
+                'duration_hours': rng.randint(3, 10),
+                'duration_minutes': rng.randint(0, 59),
+                'quality_10': rng.randint(1, 10),
+                'start_time': f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}',
+                'end_time': f'{rng.randint(0, 23):02d}:{rng.randint(0, 59):02d}'
+            })
+        histories.append(history)
+
+    return {
+        'generate_sleep_phases': measure(lambda i: SleepPhaseAnalyzer.generate_sleep_phases(durations[i]), iterations),
+        'analyze_phases': measure(lambda i: SleepPhaseAnalyzer.analyze_phases(phases[i]), iterations),
+        'get_recommendations': measure(lambda i: SleepAdvisor.get_recommendations(histories[i]), iterations)
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Бенчмарки backend и анализа сна')
+    parser.add_argument('--sizes', default=','.join(str(s) for s in DEFAULT_SIZES),
+                        help='размеры наборов данных через запятую')
+    parser.add_argument('--users', type=int, default=1000, help='количество пользователей')
+    parser.add_argument('--iterations', type=int, default=1000, help='запросов на эндпоинт')
+    parser.add_argument('--storage', choices=('memory', 'sqlite'), default='memory')
+    parser.add_argument('--seed', type=int, default=42)
+    parser.add_argument('--output', help='файл для JSON-отчета (по умолчанию stdout)')
+    args = parser.parse_args()
+
+    rng = random.Random(args.seed)
+    report = {
+        'timestamp': datetime.now().isoformat(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'storage': args.storage,
+        'users': args.users,
+        'iterations': args.iterations,
+        'analysis': bench_analysis(args.iterations, rng),
+        'datasets': []
+    }
+
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        for size in (int(s) for s in args.sizes.split(',') if s):
+            if args.storage == 'sqlite':
+                storage_url = os.path.join(tmp_dir, f'bench_{size}.db')
+            else:
+                storage_url = 'memory'
+            app_module = load_app(storage_url)
+            dataset = {'records': size, 'setup': populate(app_module, size, args.users, rng)}
+            dataset['endpoints'] = bench_endpoints(app_module, args.users, args.iterations, rng)
+            app_module.storage.close()
+            report['datasets'].append(dataset)
+            print(f'{size} записей: готово', file=sys.stderr)
+
+    output = json.dumps(report, indent=2, ensure_ascii=False)
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            f.write(output + '\n')
+    else:
+        print(output)
+
+
+if __name__ == '__main__':
+    main()
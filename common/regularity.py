@@ -0,0 +1,89 @@
+import numpy as np
+
+MINUTES_PER_DAY = 1440
+IRREGULAR_STD_MINUTES = 60
+MIN_SAMPLES = 3
+
+
+def parse_clock(value):
+    if not isinstance(value, str):
+        return None
+    for separator in ('T', ' '):
+        if separator in value:
+            value = value.split(separator, 1)[1]
+    try:
+        hours, minutes = value.split(':')[:2]
+        hours, minutes = int(hours), int(minutes[:2])
+    except ValueError:
+        return None
+    if not (0 <= hours < 24 and 0 <= minutes < 60):
+        return None
+    return hours * 60 + minutes
+
+
+def clock_minutes(values):
+    return np.array([np.nan if m is None else m for m in map(parse_clock, values)], dtype=np.float64)
+
+
+def to_angles(minutes):
+    return np.asarray(minutes, dtype=np.float64) * (2 * np.pi / MINUTES_PER_DAY)
+
+
+def circular_from_sums(cos_sum, sin_sum, count):
+    cos_sum = np.asarray(cos_sum, dtype=np.float64)
+    sin_sum = np.asarray(sin_sum, dtype=np.float64)
+    count = np.asarray(count, dtype=np.float64)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        resultant = np.minimum(np.hypot(cos_sum, sin_sum) / count, 1.0)
+        std = np.sqrt(-2 * np.log(resultant)) * (MINUTES_PER_DAY / (2 * np.pi))
+    mean = np.mod(np.arctan2(sin_sum, cos_sum), 2 * np.pi) * (MINUTES_PER_DAY / (2 * np.pi))
+
+    empty = count == 0
+    mean = np.where(empty, np.nan, mean)
+    resultant = np.where(empty, np.nan, resultant)
+    std = np.where(empty, np.nan, np.where(resultant >= 1.0, 0.0, std))
+    return {
+        'mean': mean,
+        'std': std,
+        'resultant': resultant,
+        'count': count.astype(np.int64)
+    }
+
+
+def circular_stats(minutes, axis=-1):
+    angles = to_angles(minutes)
+    valid = ~np.isnan(angles)
+    angles = np.where(valid, angles, 0.0)
+    cos_sum = np.where(valid, np.cos(angles), 0.0).sum(axis=axis)
+    sin_sum = np.where(valid, np.sin(angles), 0.0).sum(axis=axis)
+    return circular_from_sums(cos_sum, sin_sum, valid.sum(axis=axis))
+
+
+def grouped_circular_stats(groups, minutes, group_count):
+    groups = np.asarray(groups, dtype=np.int64)
+    angles = to_angles(minutes)
+    valid = ~np.isnan(angles)
+    groups, angles = groups[valid], angles[valid]
+    return circular_from_sums(
+        np.bincount(groups, weights=np.cos(angles), minlength=group_count),
+        np.bincount(groups, weights=np.sin(angles), minlength=group_count),
+        np.bincount(groups, minlength=group_count)
+    )
+
+
+def regularity_score(std, count, min_samples=MIN_SAMPLES):
+    std = np.asarray(std, dtype=np.float64)
+    score = np.clip(100 - std * (50 / IRREGULAR_STD_MINUTES), 0, 100)
+    return np.where(np.asarray(count) >= min_samples, np.round(score), np.nan)
+
+
+def is_irregular(std, count, min_samples=MIN_SAMPLES):
+    return (np.asarray(count) >= min_samples) & (np.nan_to_num(std) > IRREGULAR_STD_MINUTES)
+
+
+def format_clock(minutes):
+    if minutes is None or np.isnan(minutes):
+        return None
+    minutes = int(round(float(minutes))) % MINUTES_PER_DAY
+    return f'{minutes // 60:02d}:{minutes % 60:02d}'
@@ -0,0 +1,134 @@
+import numpy as np
+
+PHASE_TYPES = ('light', 'medium', 'deep', 'rem')
+
+REC_REDUCE_SCREEN = 1
+REC_LONGER_SLEEP = 2
+REC_HABITS_OK = 4
+
+RECORD_RECOMMENDATIONS = (
+    (REC_REDUCE_SCREEN, 'Сократите экранное время перед сном'),
+    (REC_LONGER_SLEEP, 'Сон короче нормы, увеличьте продолжительность'),
+    (REC_HABITS_OK, 'Привычки нормальные'),
+)
+
+PHASE_NO_DATA = 1
+PHASE_SHORT_SLEEP = 2
+PHASE_LOW_DEEP = 4
+PHASE_LOW_REM = 8
+PHASE_FEW_CYCLES = 16
+PHASE_EXCELLENT = 32
+
+
+def round_half_even(values, decimals):
+    values = np.asarray(values, dtype=np.float64)
+    rounded = np.round(values, decimals)
+    scaled = values * 10 ** decimals
+    near_tie = np.abs(np.abs(scaled - np.trunc(scaled)) - 0.5) < 1e-6
+    if near_tie.any():
+        rounded[near_tie] = [round(float(v), decimals) for v in values[near_tie]]
+    return rounded
+
+
+def score_records(duration_hours, screen_time):
+    duration_hours = np.asarray(duration_hours, dtype=np.float64)
+    screen_time = np.asarray(screen_time, dtype=np.float64)
+
+    quality_score = round_half_even(np.clip(100 - screen_time * 0.25, 0, 100), 1)
+
+    high_screen = screen_time > 120
+    short_sleep = duration_hours < 6.5
+
+    codes = np.zeros(len(duration_hours), dtype=np.uint8)
+    codes[high_screen] |= REC_REDUCE_SCREEN
+    codes[short_sleep] |= REC_LONGER_SLEEP
+    codes[codes == 0] = REC_HABITS_OK
+
+    return {
+        'quality_score': quality_score,
+        'high_screen': high_screen,
+        'short_sleep': short_sleep,
+        'recommendation_codes': codes
+    }
+
+
+def record_recommendations(code):
+    return [text for flag, text in RECORD_RECOMMENDATIONS if code & flag]
+
+
+def phase_columns(phase_lists):
+    n = len(phase_lists)
+    minutes = np.zeros((n, len(PHASE_TYPES)), dtype=np.int64)
+    totals = np.zeros(n, dtype=np.int64)
+    cycles = np.zeros(n, dtype=np.int64)
+    columns = {phase_type: i for i, phase_type in enumerate(PHASE_TYPES)}
+
+    for row, phases in enumerate(phase_lists):
+        if not phases:
+            continue
+        for phase in phases:
+            column = columns.get(phase['type'])
+            if column is not None:
+                minutes[row, column] += phase['duration']
+            totals[row] += phase['duration']
+        cycles[row] = len(set(p.get('cycle', 0) for p in phases))
+
+    return minutes, totals, cycles
+
+
+def score_phases(total_minutes, deep_minutes, rem_minutes, cycles):
+    total_minutes = np.asarray(total_minutes)
+    deep_minutes = np.asarray(deep_minutes)
+    rem_minutes = np.asarray(rem_minutes)
+    cycles = np.asarray(cycles)
+
+    score = np.select(
+        [total_minutes >= 420, total_minutes >= 360, total_minutes >= 300],
+        [40, 30, 20], default=10
+    )
+    score = score + np.select(
+        [deep_minutes >= 90, deep_minutes >= 60, deep_minutes >= 30, deep_minutes > 0],
+        [30, 25, 20, 10], default=0
+    )
+    score = score + np.select(
+        [rem_minutes >= 90, rem_minutes >= 60, rem_minutes >= 30, rem_minutes > 0],
+        [20, 15, 10, 5], default=0
+    )
+    score = score + np.select(
+        [cycles >= 5, cycles >= 4, cycles >= 3, cycles >= 2],
+        [10, 8, 5, 3], default=0
+    )
+
+    no_data = cycles == 0
+    score = np.where(no_data, 0, np.minimum(score, 100))
+
+    flags = np.zeros(len(score), dtype=np.uint8)
+    flags[total_minutes < 360] |= PHASE_SHORT_SLEEP
+    flags[deep_minutes < 30] |= PHASE_LOW_DEEP
+    flags[rem_minutes < 30] |= PHASE_LOW_REM
+    flags[cycles < 4] |= PHASE_FEW_CYCLES
+    flags[flags == 0] = PHASE_EXCELLENT
+    flags[no_data] = PHASE_NO_DATA
+
+    return {
+        'total_score': score,
+        'flags': flags
+    }
+
+
+def phase_analysis(flags, cycles):
+    if flags & PHASE_NO_DATA:
+        return ['Недостаточно данных']
+
+    analysis = []
+    if flags & PHASE_SHORT_SLEEP:
+        analysis.append("Слишком короткий сон")
+    if flags & PHASE_LOW_DEEP:
+        analysis.append("Мало глубокого сна")
+    if flags & PHASE_LOW_REM:
+        analysis.append("Мало REM-сна")
+    if flags & PHASE_FEW_CYCLES:
+        analysis.append(f"Мало циклов сна ({cycles})")
+    if flags & PHASE_EXCELLENT:
+        analysis.append("Отличное качество сна")
+    return analysis
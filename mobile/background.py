@@ -0,0 +1,25 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from kivy.clock import Clock
+
+
+class BackgroundWorker:
+    def __init__(self, max_workers=1):
+        self.executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix='sleep-worker')
+
+    def submit(self, func, *args, on_done=None):
+        future = self.executor.submit(func, *args)
+        future.add_done_callback(lambda f: Clock.schedule_once(lambda dt: self.finish(f, on_done)))
+        return future
+
+    @staticmethod
+    def finish(future, on_done):
+        error = future.exception()
+        if error is not None:
+            print(f"Ошибка фоновой задачи: {error}")
+            return
+        if on_done is not None:
+            on_done(future.result())
+
+    def shutdown(self):
+        self.executor.shutdown(wait=True)
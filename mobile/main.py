@@ -1,6 +1,4 @@
 import os
-import json
-import random
 from datetime import datetime, timedelta
 from kivy.lang import Builder
 from kivy.properties import BooleanProperty, StringProperty, NumericProperty, ListProperty
@@ -15,228 +13,17 @@ from kivymd.uix.dialog import MDDialog
 from kivymd.uix.button import MDFlatButton, MDRaisedButton
 from kivymd.uix.list import OneLineListItem
 
-Builder.load_file('sleep_tracker.kv')
-
-
-class SleepPhaseAnalyzer:
-    @staticmethod
-    def generate_sleep_phases(total_minutes):
-        if total_minutes < 30:
-            return []
-
-        phases = []
-        remaining = total_minutes
-        cycle_num = 1
-
-        while remaining > 20:
-            light = min(random.randint(5, 15), remaining)
-            if light > 0:
-                phases.append({'type': 'light', 'duration': light, 'cycle': cycle_num})
-                remaining -= light
-
-            medium = min(random.randint(20, 35), remaining)
-            if medium > 0:
-                phases.append({'type': 'medium', 'duration': medium, 'cycle': cycle_num})
-                remaining -= medium
-
-            deep = min(random.randint(15, 40), remaining)
-            if deep > 0:
-                phases.append({'type': 'deep', 'duration': deep, 'cycle': cycle_num})
-                remaining -= deep
-
-            rem = min(random.randint(10, 25), remaining)
-            if rem > 0:
-                phases.append({'type': 'rem', 'duration': rem, 'cycle': cycle_num})
-                remaining -= rem
-
-            cycle_num += 1
-
-        return phases
-
-    @staticmethod
-    def analyze_phases(phases):
-        if not phases:
-            return {
-                'total_score': 0,
-                'analysis': ['Недостаточно данных'],
-                'phase_distribution': {},
-                'total_duration': 0,
-                'deep_sleep': 0,
-                'rem_sleep': 0,
-                'cycles': 0
-            }
-
-        total_duration = sum(p['duration'] for p in phases)
-        phase_dist = {}
-
-        for phase in phases:
-            phase_type = phase['type']
-            phase_dist[phase_type] = phase_dist.get(phase_type, 0) + phase['duration']
-
-        cycles = len(set(p.get('cycle', 0) for p in phases))
-        score = 0
-
-        if total_duration >= 420:
-            score += 40
-        elif total_duration >= 360:
-            score += 30
-        elif total_duration >= 300:
-            score += 20
-        else:
-            score += 10
-
-        deep_sleep = phase_dist.get('deep', 0)
-        if deep_sleep >= 90:
-            score += 30
-        elif deep_sleep >= 60:
-            score += 25
-        elif deep_sleep >= 30:
-            score += 20
-        elif deep_sleep > 0:
-            score += 10
-
-        rem_sleep = phase_dist.get('rem', 0)
-        if rem_sleep >= 90:
-            score += 20
-        elif rem_sleep >= 60:
-            score += 15
-        elif rem_sleep >= 30:
-            score += 10
-        elif rem_sleep > 0:
-            score += 5
-
-        if cycles >= 5:
-            score += 10
-        elif cycles >= 4:
-            score += 8
-        elif cycles >= 3:
-            score += 5
-        elif cycles >= 2:
-            score += 3
-
-        analysis = []
-        if total_duration < 360:
-            analysis.append("Слишком короткий сон")
-        if deep_sleep < 30:
-            analysis.append("Мало глубокого сна")
-        if rem_sleep < 30:
-            analysis.append("Мало REM-сна")
-        if cycles < 4:
-            analysis.append(f"Мало циклов сна ({cycles})")
-
-        if not analysis:
-            analysis.append("Отличное качество сна")
-
-        return {
-            'total_score': min(score, 100),
-            'analysis': analysis,
-            'phase_distribution': phase_dist,
-            'total_duration': total_duration,
-            'deep_sleep': deep_sleep,
-            'rem_sleep': rem_sleep,
-            'cycles': cycles
-        }
+from background import BackgroundWorker
+from profiling import profiler
+from sleep_analysis import SleepPhaseAnalyzer, SleepAdvisor
+from sleep_archive import SleepArchive
+from sleep_journal import SleepJournal, record_key
+from sleep_record import SleepRecord, to_records
+from sleep_store import SleepStore, record_minutes, record_quality
+from sleep_timer import SleepTimer
+from sync_client import SYNC_INTERVAL, SyncClient
 
-
-class SleepAdvisor:
-    @staticmethod
-    def get_recommendations(sleep_data):
-        if not sleep_data or len(sleep_data) < 3:
-            return ["Соберите больше данных о сне (минимум 3 записи)"]
-
-        recent_data = sleep_data[-7:] if len(sleep_data) >= 7 else sleep_data
-        total_records = len(recent_data)
-        total_minutes = sum(r['duration_hours'] * 60 + r['duration_minutes'] for r in recent_data)
-        avg_minutes = total_minutes // total_records if total_records > 0 else 0
-        total_quality = sum(r.get('quality_10', 5) for r in recent_data)
-        avg_quality = total_quality // total_records if total_records > 0 else 5
-
-        bed_times = []
-        wake_times = []
-
-        for record in recent_data:
-            if 'start_time' in record:
-                try:
-                    hour = int(record['start_time'].split(':')[0])
-                    bed_times.append(hour)
-                except:
-                    pass
-
-            if 'end_time' in record:
-                try:
-                    hour = int(record['end_time'].split(':')[0])
-                    wake_times.append(hour)
-                except:
-                    pass
-
-        recommendations = []
-
-        if avg_minutes < 360:
-            recommendations.append("Увеличьте продолжительность сна до 7-9 часов")
-            recommendations.append("Попробуйте ложиться на 30-60 минут раньше")
-        elif avg_minutes > 540:
-            recommendations.append("Слишком долгий сон (более 9 часов)")
-            recommendations.append("Установите будильник на 8-9 часов")
-        elif 420 <= avg_minutes <= 480:
-            recommendations.append("Отличная длительность сна")
-
-        if avg_quality < 5:
-            recommendations.append("Качество сна низкое")
-            recommendations.append("Поддерживайте температуру 18-20°C")
-        elif avg_quality >= 8:
-            recommendations.append("Отличное качество сна")
-        else:
-            recommendations.append("Качество сна среднее")
-
-        if bed_times and len(bed_times) >= 3:
-            bed_time_std = max(bed_times) - min(bed_times)
-            if bed_time_std > 2:
-                recommendations.append("Нерегулярное время отхода ко сну")
-
-        if wake_times and len(wake_times) >= 3:
-            wake_time_std = max(wake_times) - min(wake_times)
-            if wake_time_std > 2:
-                recommendations.append("Просыпайтесь в одно и то же время")
-
-        general_recs = [
-            "Отложите электронные устройства за 1-2 часа до сна",
-            "Избегайте кофеина после 14:00",
-            "Не ешьте тяжелую пищу за 3 часа до сна",
-            "Регулярные физические упражнения улучшают сон",
-            "Поддерживайте водный баланс"
-        ]
-
-        if len(recommendations) < 5:
-            num_to_add = min(5 - len(recommendations), len(general_recs))
-            recommendations.extend(general_recs[:num_to_add])
-
-        return recommendations[:10]
-
-    @staticmethod
-    def get_daily_tip():
-        tips = [
-            "Сегодня попробуйте почитать бумажную книгу перед сном",
-            "Проветрите комнату перед сном",
-            "Попробуйте медитацию перед сном",
-            "Заведите дневник сна",
-            "Установите постоянное время подъема",
-            "Избегайте тяжелой пищи перед сном",
-            "Теплая ванна помогает расслабиться",
-            "Белый шум может помочь заснуть",
-            "Утром получайте солнечный свет",
-            "Если не можете заснуть 20 минут, встаньте"
-        ]
-        return random.choice(tips)
-
-    @staticmethod
-    def get_quick_tips():
-        return [
-            "Выключите уведомления перед сном",
-            "Используйте ночной режим на устройствах",
-            "Попробуйте ароматерапию с лавандой",
-            "Наденьте носки если мерзнут ноги",
-            "Читайте бумажные книги перед сном"
-        ]
+Builder.load_file('sleep_tracker.kv')
 
 
 class WeeklyTable(BoxLayout):
@@ -370,65 +157,225 @@ class SleepTrackerScreen(Screen):
     def __init__(self, **kwargs):
         super().__init__(**kwargs)
         self.sleep_start_time = None
-        self.sleep_data = []
+        self.store = SleepStore()
+        self.data_loaded = False
+        self.load_failed = False
         self.timer_event = None
         self.sleep_advisor = SleepAdvisor()
-        self.load_data()
+        self.journal = SleepJournal()
+        self.archive = None
+        self.archive_summary = None
+        self.worker = BackgroundWorker()
+        self.timer = SleepTimer()
+        self.sync = None
+        self.sync_worker = None
         self.update_display()
-        self.update_weekly_chart()
-        self.cleanup_old_data()
+        self.ids.weekly_summary_label.text = "Загрузка данных..."
+        self.worker.submit(self.load_in_background, on_done=self.on_data_loaded)
+
+        if self.timer.restore():
+            self.is_tracking = True
+            self.sleep_start_time = self.timer.start_time
+            self.set_tracking_controls(True)
+            self.start_display_updates()
 
+        sync_url = os.environ.get('SLEEP_SYNC_URL')
+        if sync_url:
+            self.sync_worker = BackgroundWorker()
+            self.sync_worker.submit(self.open_sync, sync_url)
+            Clock.schedule_interval(lambda dt: self.request_sync(), SYNC_INTERVAL)
+
+    @profiler.timed('load_data')
     def load_data(self):
         try:
-            if os.path.exists('sleep_data.json'):
-                with open('sleep_data.json', 'r', encoding='utf-8') as f:
-                    self.sleep_data = json.load(f)
+            records = to_records(self.journal.load())
+        except Exception as e:
+            print(f"Ошибка загрузки, сохранение снимка отключено: {e}")
+            self.load_failed = True
+            return []
+        self.load_failed = False
+        return records
+
+    def load_in_background(self):
+        try:
+            self.archive = SleepArchive()
+        except Exception as e:
+            print(f"Ошибка открытия архива: {e}")
+        store = SleepStore(self.cleanup_old_data(self.load_data()))
+        if self.archive is not None:
+            self.archive_summary = self.archive.summary()
+        return store
+
+    def on_data_loaded(self, store):
+        for record in self.store.records:
+            store.append(record)
+        self.store = store
+        self.data_loaded = True
+        self.queue_sync(list(store.records), backfill=True)
+        self.update_display()
+        self.update_weekly_chart()
+
+    def can_compact(self):
+        return self.data_loaded and not self.load_failed
+
+    def clear_archive(self):
+        if self.archive is None:
+            return
+        try:
+            self.archive.clear()
         except Exception as e:
-            print(f"Ошибка загрузки: {e}")
-            self.sleep_data = []
+            print(f"Ошибка очистки архива: {e}")
 
+    @profiler.timed('save_data')
     def save_data(self):
+        if self.can_compact():
+            self.worker.submit(self.compact_data, list(self.store.records))
+
+    @profiler.timed('compact_data')
+    def compact_data(self, records):
+        try:
+            self.journal.compact(records)
+        except Exception as e:
+            print(f"Ошибка сохранения: {e}")
+
+    def log_change(self, write, *args):
+        records = list(self.store.records) if self.can_compact() else None
+        self.worker.submit(self.write_change, write, args, records)
+
+    @profiler.timed('write_change')
+    def write_change(self, write, args, records):
         try:
-            with open('sleep_data.json', 'w', encoding='utf-8') as f:
-                json.dump(self.sleep_data, f, indent=2, ensure_ascii=False)
+            write(*args)
+            if records is not None and self.journal.should_compact():
+                self.journal.compact(records)
         except Exception as e:
             print(f"Ошибка сохранения: {e}")
 
-    def cleanup_old_data(self):
-        if not self.sleep_data:
+    def open_sync(self, url):
+        self.sync = SyncClient(url, user_id=int(os.environ.get('SLEEP_USER_ID', 1)))
+
+    def queue_sync(self, records, backfill=False):
+        if self.sync_worker is None:
+            return
+        self.sync_worker.submit(self.enqueue_sync, records, backfill)
+        self.request_sync()
+
+    def enqueue_sync(self, records, backfill):
+        if self.sync is None:
             return
+        if backfill:
+            self.sync.backfill(records)
+        else:
+            self.sync.enqueue(records)
+
+    def clear_sync_outbox(self):
+        if self.sync is not None:
+            self.sync.clear_outbox()
+
+    def request_sync(self):
+        if self.sync_worker is not None and self.data_loaded:
+            self.sync_worker.submit(self.run_sync, on_done=self.on_synced)
+
+    @profiler.timed('run_sync')
+    def run_sync(self):
+        if self.sync is None:
+            return []
+        try:
+            return self.sync.sync()
+        except Exception as e:
+            print(f"Ошибка синхронизации: {e}")
+            return []
+
+    def on_synced(self, records):
+        if not records:
+            return
+        known = set(record_key(r) for r in self.store.records)
+        for record in to_records(records):
+            if record_key(record) in known:
+                continue
+            known.add(record_key(record))
+            self.store.append(record)
+            self.log_change(self.journal.append, record)
+        self.update_display()
+        self.update_weekly_chart()
+
+    def cleanup_old_data(self, records):
+        if not records:
+            return records
 
         current_date = datetime.now()
         cutoff_date = current_date - timedelta(days=7)
         new_data = []
+        old_data = []
 
-        for record in self.sleep_data:
+        for record in records:
             try:
                 record_date = datetime.strptime(record['date'], '%Y-%m-%d')
                 if record_date >= cutoff_date:
                     new_data.append(record)
+                    continue
             except:
-                continue
-
-        if len(new_data) < len(self.sleep_data):
-            self.sleep_data = new_data
-            self.save_data()
+                pass
+            old_data.append(record)
 
+        if old_data:
+            if self.archive is None:
+                return records
+            try:
+                self.archive.append(old_data)
+            except Exception as e:
+                print(f"Ошибка архивации: {e}")
+                return records
+            self.write_change(self.journal.delete, (old_data,), new_data)
+        return new_data
+
+    @profiler.timed('show_menu')
     def show_menu(self, *args):
-        dialog = MDDialog(
-            title="Меню",
-            text="Трекер сна",
-            buttons=[
+        buttons = [
+            MDFlatButton(
+                text="ЗАКРЫТЬ",
+                on_release=lambda x: dialog.dismiss()
+            )
+        ]
+
+        if profiler.enabled:
+            buttons += [
                 MDFlatButton(
-                    text="ЗАКРЫТЬ",
-                    on_release=lambda x: dialog.dismiss()
+                    text="СТОП ПРОФИЛЬ" if profiler.profile else "СТАРТ ПРОФИЛЬ",
+                    on_release=lambda x: (dialog.dismiss(), self.toggle_profiling())
+                ),
+                MDFlatButton(
+                    text="ОТЧЕТ",
+                    on_release=lambda x: (dialog.dismiss(), self.dump_profiling_report())
                 )
             ]
+
+        dialog = MDDialog(
+            title="Меню",
+            text="Трекер сна",
+            buttons=buttons
         )
         dialog.open()
 
+    def toggle_profiling(self):
+        path = profiler.toggle_cprofile()
+        if path:
+            self.show_message("Профилирование", f"Профиль сохранен:\n{path}")
+        else:
+            self.show_message("Профилирование", "cProfile запущен")
+
+    def dump_profiling_report(self):
+        try:
+            path = profiler.dump_report()
+        except OSError as e:
+            self.show_message("Профилирование", f"Ошибка сохранения отчета: {e}")
+            return
+        self.show_message("Профилирование", f"Отчет сохранен:\n{path}")
+
+    @profiler.timed('show_recommendations')
     def show_recommendations(self, *args):
-        recommendations = self.sleep_advisor.get_recommendations(self.sleep_data)
+        with profiler.span('show_recommendations.data'):
+            recommendations = self.sleep_advisor.get_recommendations(self.store.records)
         daily_tip = self.sleep_advisor.get_daily_tip()
         quick_tips = self.sleep_advisor.get_quick_tips()
 
@@ -497,9 +444,9 @@ class SleepTrackerScreen(Screen):
                 )
                 content.add_widget(rec_item)
 
-        if len(self.sleep_data) >= 3:
-            total_records = len(self.sleep_data)
-            total_minutes = sum(r['duration_hours'] * 60 + r['duration_minutes'] for r in self.sleep_data[-7:])
+        if len(self.store) >= 3:
+            total_records = len(self.store)
+            total_minutes = sum(record_minutes(r) for r in self.store.records[-7:])
             avg_minutes = total_minutes // min(7, total_records) if min(7, total_records) > 0 else 0
             avg_hours = avg_minutes // 60
             avg_minutes_remainder = avg_minutes % 60
@@ -514,9 +461,9 @@ class SleepTrackerScreen(Screen):
                 halign='left'
             )
             content.add_widget(stats_label)
-        elif self.sleep_data:
+        elif self.store:
             stats_label = Label(
-                text=f"\nУ вас {len(self.sleep_data)} запись(ей) о сне.",
+                text=f"\nУ вас {len(self.store)} запись(ей) о сне.",
                 font_size='14sp',
                 color=(0.5, 0.5, 0.5, 1),
                 size_hint_y=None,
@@ -550,6 +497,7 @@ class SleepTrackerScreen(Screen):
         )
         dialog.open()
 
+    @profiler.timed('show_manual_delete_dialog')
     def show_manual_delete_dialog(self, *args):
         dialog = MDDialog(
             title="Удаление всех данных",
@@ -569,26 +517,31 @@ class SleepTrackerScreen(Screen):
         dialog.open()
 
     def confirm_manual_delete(self, dialog):
-        self.sleep_data = []
-        self.save_data()
+        self.store.clear()
+        self.log_change(self.journal.clear)
+        self.archive_summary = None
+        self.worker.submit(self.clear_archive)
+        if self.sync_worker is not None:
+            self.sync_worker.submit(self.clear_sync_outbox)
         self.update_display()
         self.update_weekly_chart()
         dialog.dismiss()
         self.show_message("Данные удалены", "Все записи удалены.")
 
+    @profiler.timed('show_sleep_analysis')
     def show_sleep_analysis(self, *args):
-        if not self.sleep_data:
+        if not self.store:
             self.show_message("Анализ сна", "Нет записей о сне.")
             return
 
         last_record = None
-        for record in reversed(self.sleep_data):
+        for record in reversed(self.store.records):
             if 'sleep_phases' in record and record['sleep_phases']:
                 last_record = record
                 break
 
         if not last_record:
-            last_record = self.sleep_data[-1] if self.sleep_data else None
+            last_record = self.store.records[-1] if self.store else None
 
         if not last_record:
             self.show_message("Анализ сна", "Нет записей для анализа.")
@@ -596,17 +549,21 @@ class SleepTrackerScreen(Screen):
 
         total_minutes = last_record['duration_hours'] * 60 + last_record['duration_minutes']
 
+        phases_generated = False
         if 'sleep_phases' not in last_record or not last_record['sleep_phases']:
             if total_minutes > 30:
                 last_record['sleep_phases'] = SleepPhaseAnalyzer.generate_sleep_phases(total_minutes)
-                self.save_data()
+                phases_generated = True
             else:
                 self.show_message("Анализ сна",
                                   f"Недостаточно данных.\n\n"
                                   f"Последний сон: {last_record['duration_hours']}ч {last_record['duration_minutes']}м")
                 return
 
-        analysis = SleepPhaseAnalyzer.analyze_phases(last_record['sleep_phases'])
+        with profiler.span('show_sleep_analysis.data'):
+            analysis, changed = SleepPhaseAnalyzer.record_analysis(last_record, force=phases_generated)
+        if changed:
+            self.log_change(self.journal.update, last_record)
 
         content_scroll = ScrollView(size_hint=(1, 1), do_scroll_x=False)
 
@@ -733,9 +690,8 @@ class SleepTrackerScreen(Screen):
         )
         dialog.open()
 
+    @profiler.timed('show_weekly_chart')
     def show_weekly_chart(self, *args):
-        self.update_weekly_chart()
-
         if not self.weekly_data:
             self.show_message("Нет данных", "Нет данных о сне за последние 7 дней.")
             return
@@ -766,11 +722,16 @@ class SleepTrackerScreen(Screen):
         )
         dialog.open()
 
+    @profiler.timed('update_weekly_chart')
     def update_weekly_chart(self):
-        self.weekly_data = []
+        self.weekly_data = self.calculate_weekly_data(self.store)
 
-        if not self.sleep_data:
-            return
+    @staticmethod
+    def calculate_weekly_data(store):
+        weekly_data = []
+
+        if not store:
+            return weekly_data
 
         days_order = ['Пн', 'Вт', 'Ср', 'Чт', 'Пт', 'Сб', 'Вс']
 
@@ -778,19 +739,18 @@ class SleepTrackerScreen(Screen):
             target_date = (datetime.now() - timedelta(days=i)).strftime('%Y-%m-%d')
             day_name = days_order[(datetime.now() - timedelta(days=i)).weekday()]
 
-            day_records = [r for r in self.sleep_data if r.get('date') == target_date]
+            totals = store.day_totals(target_date)
 
-            if day_records:
-                total_hours = sum(r['duration_hours'] for r in day_records)
-                total_minutes = sum(r['duration_minutes'] for r in day_records)
+            if totals:
+                total_hours = totals.hours
+                total_minutes = totals.minutes
 
                 total_hours += total_minutes // 60
                 total_minutes = total_minutes % 60
 
-                total_quality = sum(r.get('quality_10', 5) for r in day_records)
-                avg_quality = total_quality // len(day_records) if day_records else 5
+                avg_quality = totals.quality_10 // totals.count
 
-                self.weekly_data.append({
+                weekly_data.append({
                     'day': day_name,
                     'duration_hours': total_hours,
                     'duration_minutes': total_minutes,
@@ -798,6 +758,8 @@ class SleepTrackerScreen(Screen):
                     'date': target_date
                 })
 
+        return weekly_data
+
     def calculate_sleep_quality_10(self, hours, minutes):
         total_hours = hours + minutes / 60
 
@@ -813,34 +775,46 @@ class SleepTrackerScreen(Screen):
     def start_sleep_tracking(self):
         if not self.is_tracking:
             self.is_tracking = True
-            self.sleep_start_time = datetime.now()
+            self.timer.start()
+            self.sleep_start_time = self.timer.start_time
+            self.worker.submit(self.timer.save, self.timer.state())
 
-            self.elapsed_hours = 0
-            self.elapsed_minutes = 0
-            self.elapsed_seconds = 0
-            self.update_duration_display()
+            self.set_tracking_controls(True)
+            self.start_display_updates()
 
+    def set_tracking_controls(self, tracking):
+        if tracking:
             self.ids.status_label.text = "Спит..."
             self.ids.start_button.disabled = True
             self.ids.stop_button.disabled = False
             self.ids.start_button.md_bg_color = (0.5, 0.5, 0.5, 1)
             self.ids.stop_button.md_bg_color = (0.9, 0, 0, 1)
+        else:
+            self.ids.status_label.text = "Не отслеживается"
+            self.ids.start_button.disabled = False
+            self.ids.stop_button.disabled = True
+            self.ids.start_button.md_bg_color = (0, 0.7, 0, 1)
+            self.ids.stop_button.md_bg_color = (0.5, 0.5, 0.5, 1)
 
+    def start_display_updates(self):
+        if self.is_tracking and not self.timer_event:
+            self.update_timer(0)
             self.timer_event = Clock.schedule_interval(self.update_timer, 1)
 
+    def stop_display_updates(self):
+        if self.timer_event:
+            Clock.unschedule(self.timer_event)
+            self.timer_event = None
+
     def update_timer(self, dt):
         if self.is_tracking:
-            self.elapsed_seconds += 1
-
-            if self.elapsed_seconds >= 60:
-                self.elapsed_seconds = 0
-                self.elapsed_minutes += 1
+            self.set_elapsed(self.timer.elapsed())
 
-            if self.elapsed_minutes >= 60:
-                self.elapsed_minutes = 0
-                self.elapsed_hours += 1
-
-            self.update_duration_display()
+    def set_elapsed(self, seconds):
+        self.elapsed_hours = seconds // 3600
+        self.elapsed_minutes = seconds % 3600 // 60
+        self.elapsed_seconds = seconds % 60
+        self.update_duration_display()
 
     def update_duration_display(self):
         self.current_duration = f"{self.elapsed_hours:02d}:{self.elapsed_minutes:02d}:{self.elapsed_seconds:02d}"
@@ -848,10 +822,9 @@ class SleepTrackerScreen(Screen):
     def stop_sleep_tracking(self):
         if self.is_tracking:
             self.is_tracking = False
-
-            if self.timer_event:
-                Clock.unschedule(self.timer_event)
-                self.timer_event = None
+            self.stop_display_updates()
+            self.set_elapsed(self.timer.stop())
+            self.worker.submit(self.timer.save, None)
 
             quality = self.calculate_sleep_quality_10(self.elapsed_hours, self.elapsed_minutes)
 
@@ -860,7 +833,7 @@ class SleepTrackerScreen(Screen):
             if total_minutes > 30:
                 sleep_phases = SleepPhaseAnalyzer.generate_sleep_phases(total_minutes)
 
-            record = {
+            record = SleepRecord.from_dict({
                 'date': datetime.now().strftime('%Y-%m-%d'),
                 'start_time': self.sleep_start_time.strftime('%H:%M') if self.sleep_start_time else "00:00",
                 'end_time': datetime.now().strftime('%H:%M'),
@@ -869,16 +842,14 @@ class SleepTrackerScreen(Screen):
                 'quality_10': quality,
                 'sleep_phases': sleep_phases,
                 'timestamp': datetime.now().isoformat()
-            }
+            })
+            SleepPhaseAnalyzer.record_analysis(record)
 
-            self.sleep_data.append(record)
-            self.save_data()
+            self.store.append(record)
+            self.log_change(self.journal.append, record)
+            self.queue_sync([record])
 
-            self.ids.status_label.text = "Не отслеживается"
-            self.ids.start_button.disabled = False
-            self.ids.stop_button.disabled = True
-            self.ids.start_button.md_bg_color = (0, 0.7, 0, 1)
-            self.ids.stop_button.md_bg_color = (0.5, 0.5, 0.5, 1)
+            self.set_tracking_controls(False)
 
             self.show_message("Сон записан",
                               f"Длительность: {self.elapsed_hours}ч {self.elapsed_minutes}м\n"
@@ -892,29 +863,18 @@ class SleepTrackerScreen(Screen):
             self.elapsed_seconds = 0
             self.update_duration_display()
 
+    @profiler.timed('update_display')
     def update_display(self):
         today = datetime.now().strftime('%Y-%m-%d')
-        today_sleep = 0
-        today_records = []
-
-        for record in self.sleep_data:
-            if record['date'] == today:
-                today_sleep += record['duration_hours'] * 60 + record['duration_minutes']
-                today_records.append(record)
+        today_totals = self.store.day_totals(today)
+        today_sleep = today_totals.total_minutes if today_totals else 0
 
         hours = today_sleep // 60
         minutes = today_sleep % 60
         self.total_sleep_today = f"{hours}ч {minutes}м"
 
-        if today_records:
-            total_quality = 0
-            for record in today_records:
-                if 'quality_10' in record:
-                    total_quality += record['quality_10']
-                elif 'quality' in record:
-                    total_quality += record['quality'] * 2
-
-            avg_quality = total_quality // len(today_records) if today_records else 5
+        if today_totals:
+            avg_quality = today_totals.quality // today_totals.count
             self.sleep_quality = f"{avg_quality}/10"
 
             if hours > 0 or minutes > 0:
@@ -927,17 +887,10 @@ class SleepTrackerScreen(Screen):
 
         self.ids.sleep_records_list.clear_widgets()
 
-        if self.sleep_data:
-            recent_records = sorted(self.sleep_data,
-                                    key=lambda x: x.get('timestamp', ''),
-                                    reverse=True)[:5]
-
-            for record in recent_records:
-                if 'quality_10' in record:
-                    quality = record['quality_10']
-                elif 'quality' in record:
-                    quality = record['quality'] * 2
-                else:
+        if self.store:
+            for record in self.store.recent(5):
+                quality = record_quality(record)
+                if quality is None:
                     quality = 5
 
                 item_text = f"{record['date']} - {record['duration_hours']}ч {record['duration_minutes']}м - {quality}/10"
@@ -945,24 +898,20 @@ class SleepTrackerScreen(Screen):
                 item = OneLineListItem(text=item_text)
                 self.ids.sleep_records_list.add_widget(item)
 
+    @profiler.timed('show_stats')
     def show_stats(self, *args):
-        if not self.sleep_data:
+        if not self.store:
             self.show_message("Статистика", "Нет записей о сне.")
             return
 
-        total_records = len(self.sleep_data)
-        total_minutes = sum(r['duration_hours'] * 60 + r['duration_minutes'] for r in self.sleep_data)
+        total_records = len(self.store)
+        total_minutes = self.store.totals.total_minutes
 
         avg_minutes = total_minutes // total_records if total_records > 0 else 0
         avg_hours = avg_minutes // 60
         avg_minutes_remainder = avg_minutes % 60
 
-        total_quality = 0
-        for record in self.sleep_data:
-            if 'quality_10' in record:
-                total_quality += record['quality_10']
-            elif 'quality' in record:
-                total_quality += record['quality'] * 2
+        total_quality = self.store.totals.quality
         avg_quality = total_quality // total_records if total_records > 0 else 5
 
         stats_text = (
@@ -973,6 +922,13 @@ class SleepTrackerScreen(Screen):
             f"• Общее время сна: {total_minutes // 60}ч {total_minutes % 60}м"
         )
 
+        if self.archive_summary and self.archive_summary['count']:
+            archived_minutes = self.archive_summary['total_minutes']
+            stats_text += (
+                f"\n• В архиве: {self.archive_summary['count']} записей, "
+                f"{archived_minutes // 60}ч {archived_minutes % 60}м"
+            )
+
         dialog = MDDialog(
             title="Статистика сна",
             text=stats_text,
@@ -995,6 +951,7 @@ class SleepTrackerScreen(Screen):
         )
         dialog.open()
 
+    @profiler.timed('show_tips')
     def show_tips(self, *args):
         daily_tip = self.sleep_advisor.get_daily_tip()
 
@@ -1015,6 +972,7 @@ class SleepTrackerScreen(Screen):
         )
         dialog.open()
 
+    @profiler.timed('show_message')
     def show_message(self, title, message):
         dialog = MDDialog(
             title=title,
@@ -1033,19 +991,31 @@ class SleepTrackerApp(MDApp):
     def build(self):
         self.theme_cls.primary_palette = "Blue"
         self.theme_cls.theme_style = "Light"
+        profiler.start_frame_monitor()
         return SleepTrackerScreen(name='sleep_tracker')
 
     def on_pause(self):
+        profiler.stop_frame_monitor()
         if self.root:
+            self.root.stop_display_updates()
             self.root.save_data()
         return True
 
     def on_resume(self):
+        profiler.start_frame_monitor()
         if self.root:
+            self.root.start_display_updates()
             self.root.update_display()
             self.root.update_weekly_chart()
         return True
 
+    def on_stop(self):
+        if self.root:
+            self.root.save_data()
+            self.root.worker.shutdown()
+            if self.root.sync_worker is not None:
+                self.root.sync_worker.shutdown()
+
 
 if __name__ == '__main__':
     print("Запуск Трекера Сна...")
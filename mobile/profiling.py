@@ -0,0 +1,119 @@
+import os
+import json
+import time
+import cProfile
+import functools
+import threading
+from contextlib import contextmanager
+from datetime import datetime
+
+from kivy.clock import Clock
+
+FRAME_BUDGET = 1 / 60
+MAX_SLOW_FRAMES = 50
+
+
+class Profiler:
+    def __init__(self, enabled=False, output_dir='.'):
+        self.enabled = enabled
+        self.output_dir = output_dir
+        self.lock = threading.Lock()
+        self.spans = {}
+        self.frame_spans = []
+        self.slow_frames = []
+        self.frames = 0
+        self.frame_overruns = 0
+        self.frame_event = None
+        self.profile = None
+
+    def timed(self, name):
+        def decorator(func):
+            if not self.enabled:
+                return func
+
+            @functools.wraps(func)
+            def wrapper(*args, **kwargs):
+                with self.span(name):
+                    return func(*args, **kwargs)
+            return wrapper
+        return decorator
+
+    @contextmanager
+    def span(self, name):
+        if not self.enabled:
+            yield
+            return
+
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            elapsed = time.perf_counter() - started
+            with self.lock:
+                stats = self.spans.get(name)
+                if stats is None:
+                    stats = self.spans[name] = [0, 0.0, 0.0]
+                stats[0] += 1
+                stats[1] += elapsed
+                stats[2] = max(stats[2], elapsed)
+            if threading.current_thread() is threading.main_thread():
+                self.frame_spans.append((name, elapsed))
+
+    def start_frame_monitor(self):
+        if self.enabled and self.frame_event is None:
+            self.frame_event = Clock.schedule_interval(self.on_frame, 0)
+
+    def stop_frame_monitor(self):
+        if self.frame_event is not None:
+            Clock.unschedule(self.frame_event)
+            self.frame_event = None
+
+    def on_frame(self, dt):
+        self.frames += 1
+        if dt > FRAME_BUDGET * 2:
+            self.frame_overruns += 1
+            self.slow_frames.append({
+                'frame_ms': round(dt * 1000, 2),
+                'spans': [(name, round(elapsed * 1000, 2)) for name, elapsed in self.frame_spans]
+            })
+            del self.slow_frames[:-MAX_SLOW_FRAMES]
+        self.frame_spans = []
+
+    def toggle_cprofile(self):
+        if self.profile is None:
+            self.profile = cProfile.Profile()
+            self.profile.enable()
+            return None
+
+        self.profile.disable()
+        path = os.path.join(self.output_dir, f"sleep_profile_{datetime.now():%Y%m%d_%H%M%S}.prof")
+        self.profile.dump_stats(path)
+        self.profile = None
+        return path
+
+    def report(self):
+        with self.lock:
+            spans = {name: list(stats) for name, stats in self.spans.items()}
+        return {
+            'spans': {
+                name: {
+                    'calls': count,
+                    'total_ms': round(total * 1000, 2),
+                    'avg_ms': round(total * 1000 / count, 2),
+                    'max_ms': round(worst * 1000, 2)
+                }
+                for name, (count, total, worst) in sorted(spans.items())
+            },
+            'frames': self.frames,
+            'frame_overruns': self.frame_overruns,
+            'slow_frames': self.slow_frames
+        }
+
+    def dump_report(self):
+        path = os.path.join(self.output_dir, f"sleep_spans_{datetime.now():%Y%m%d_%H%M%S}.json")
+        with open(path, 'w', encoding='utf-8') as f:
+            json.dump(self.report(), f, indent=2, ensure_ascii=False)
+        return path
+
+
+profiler = Profiler(enabled=os.environ.get('SLEEP_PROFILE') == '1')
@@ -0,0 +1,229 @@
+import os
+import random
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from common import regularity
+from sleep_record import PhaseList
+
+RULES_VERSION = 1
+
+
+class SleepPhaseAnalyzer:
+    @staticmethod
+    def generate_sleep_phases(total_minutes):
+        if total_minutes < 30:
+            return []
+
+        phases = []
+        remaining = total_minutes
+        cycle_num = 1
+
+        while remaining > 20:
+            light = min(random.randint(5, 15), remaining)
+            if light > 0:
+                phases.append({'type': 'light', 'duration': light, 'cycle': cycle_num})
+                remaining -= light
+
+            medium = min(random.randint(20, 35), remaining)
+            if medium > 0:
+                phases.append({'type': 'medium', 'duration': medium, 'cycle': cycle_num})
+                remaining -= medium
+
+            deep = min(random.randint(15, 40), remaining)
+            if deep > 0:
+                phases.append({'type': 'deep', 'duration': deep, 'cycle': cycle_num})
+                remaining -= deep
+
+            rem = min(random.randint(10, 25), remaining)
+            if rem > 0:
+                phases.append({'type': 'rem', 'duration': rem, 'cycle': cycle_num})
+                remaining -= rem
+
+            cycle_num += 1
+
+        return phases
+
+    @staticmethod
+    def analyze_phases(phases):
+        if not phases:
+            return {
+                'total_score': 0,
+                'analysis': ['Недостаточно данных'],
+                'phase_distribution': {},
+                'total_duration': 0,
+                'deep_sleep': 0,
+                'rem_sleep': 0,
+                'cycles': 0
+            }
+
+        if isinstance(phases, PhaseList):
+            total_duration = phases.total_duration()
+            phase_dist = phases.distribution()
+            cycles = phases.cycle_count()
+        else:
+            total_duration = sum(p['duration'] for p in phases)
+            phase_dist = {}
+
+            for phase in phases:
+                phase_type = phase['type']
+                phase_dist[phase_type] = phase_dist.get(phase_type, 0) + phase['duration']
+
+            cycles = len(set(p.get('cycle', 0) for p in phases))
+
+        score = 0
+
+        if total_duration >= 420:
+            score += 40
+        elif total_duration >= 360:
+            score += 30
+        elif total_duration >= 300:
+            score += 20
+        else:
+            score += 10
+
+        deep_sleep = phase_dist.get('deep', 0)
+        if deep_sleep >= 90:
+            score += 30
+        elif deep_sleep >= 60:
+            score += 25
+        elif deep_sleep >= 30:
+            score += 20
+        elif deep_sleep > 0:
+            score += 10
+
+        rem_sleep = phase_dist.get('rem', 0)
+        if rem_sleep >= 90:
+            score += 20
+        elif rem_sleep >= 60:
+            score += 15
+        elif rem_sleep >= 30:
+            score += 10
+        elif rem_sleep > 0:
+            score += 5
+
+        if cycles >= 5:
+            score += 10
+        elif cycles >= 4:
+            score += 8
+        elif cycles >= 3:
+            score += 5
+        elif cycles >= 2:
+            score += 3
+
+        analysis = []
+        if total_duration < 360:
+            analysis.append("Слишком короткий сон")
+        if deep_sleep < 30:
+            analysis.append("Мало глубокого сна")
+        if rem_sleep < 30:
+            analysis.append("Мало REM-сна")
+        if cycles < 4:
+            analysis.append(f"Мало циклов сна ({cycles})")
+
+        if not analysis:
+            analysis.append("Отличное качество сна")
+
+        return {
+            'total_score': min(score, 100),
+            'analysis': analysis,
+            'phase_distribution': phase_dist,
+            'total_duration': total_duration,
+            'deep_sleep': deep_sleep,
+            'rem_sleep': rem_sleep,
+            'cycles': cycles
+        }
+
+    @staticmethod
+    def record_analysis(record, force=False):
+        cached = record.get('phase_analysis')
+        if not force and cached and cached.get('rules_version') == RULES_VERSION:
+            return cached, False
+
+        analysis = SleepPhaseAnalyzer.analyze_phases(record.get('sleep_phases') or [])
+        analysis['rules_version'] = RULES_VERSION
+        record['phase_analysis'] = analysis
+        return analysis, True
+
+
+class SleepAdvisor:
+    @staticmethod
+    def get_recommendations(sleep_data):
+        if not sleep_data or len(sleep_data) < 3:
+            return ["Соберите больше данных о сне (минимум 3 записи)"]
+
+        recent_data = sleep_data[-7:] if len(sleep_data) >= 7 else sleep_data
+        total_records = len(recent_data)
+        total_minutes = sum(r['duration_hours'] * 60 + r['duration_minutes'] for r in recent_data)
+        avg_minutes = total_minutes // total_records if total_records > 0 else 0
+        total_quality = sum(r.get('quality_10', 5) for r in recent_data)
+        avg_quality = total_quality // total_records if total_records > 0 else 5
+
+        bed_times = regularity.circular_stats(regularity.clock_minutes(r.get('start_time') for r in recent_data))
+        wake_times = regularity.circular_stats(regularity.clock_minutes(r.get('end_time') for r in recent_data))
+
+        recommendations = []
+
+        if avg_minutes < 360:
+            recommendations.append("Увеличьте продолжительность сна до 7-9 часов")
+            recommendations.append("Попробуйте ложиться на 30-60 минут раньше")
+        elif avg_minutes > 540:
+            recommendations.append("Слишком долгий сон (более 9 часов)")
+            recommendations.append("Установите будильник на 8-9 часов")
+        elif 420 <= avg_minutes <= 480:
+            recommendations.append("Отличная длительность сна")
+
+        if avg_quality < 5:
+            recommendations.append("Качество сна низкое")
+            recommendations.append("Поддерживайте температуру 18-20°C")
+        elif avg_quality >= 8:
+            recommendations.append("Отличное качество сна")
+        else:
+            recommendations.append("Качество сна среднее")
+
+        if regularity.is_irregular(bed_times['std'], bed_times['count']):
+            recommendations.append("Нерегулярное время отхода ко сну")
+
+        if regularity.is_irregular(wake_times['std'], wake_times['count']):
+            recommendations.append("Просыпайтесь в одно и то же время")
+
+        general_recs = [
+            "Отложите электронные устройства за 1-2 часа до сна",
+            "Избегайте кофеина после 14:00",
+            "Не ешьте тяжелую пищу за 3 часа до сна",
+            "Регулярные физические упражнения улучшают сон",
+            "Поддерживайте водный баланс"
+        ]
+
+        if len(recommendations) < 5:
+            num_to_add = min(5 - len(recommendations), len(general_recs))
+            recommendations.extend(general_recs[:num_to_add])
+
+        return recommendations[:10]
+
+    @staticmethod
+    def get_daily_tip():
+        tips = [
+            "Сегодня попробуйте почитать бумажную книгу перед сном",
+            "Проветрите комнату перед сном",
+            "Попробуйте медитацию перед сном",
+            "Заведите дневник сна",
+            "Установите постоянное время подъема",
+            "Избегайте тяжелой пищи перед сном",
+            "Теплая ванна помогает расслабиться",
+            "Белый шум может помочь заснуть",
+            "Утром получайте солнечный свет",
+            "Если не можете заснуть 20 минут, встаньте"
+        ]
+        return random.choice(tips)
+
+    @staticmethod
+    def get_quick_tips():
+        return [
+            "Выключите уведомления перед сном",
+            "Используйте ночной режим на устройствах",
+            "Попробуйте ароматерапию с лавандой",
+            "Наденьте носки если мерзнут ноги",
+            "Читайте бумажные книги перед сном"
+        ]
@@ -0,0 +1,159 @@
+import os
+import mmap
+import sys
+from array import array
+from datetime import date, datetime
+
+from sleep_record import PHASE_TYPES
+
+COLUMNS = (
+    ('date', 'I'),
+    ('start_minute', 'H'),
+    ('duration', 'H'),
+    ('quality', 'B'),
+    ('cycles', 'B'),
+    ('light', 'H'),
+    ('medium', 'H'),
+    ('deep', 'H'),
+    ('rem', 'H'),
+)
+
+
+def parse_minute(value):
+    try:
+        hours, minutes = value.split(':')[:2]
+        return (int(hours) * 60 + int(minutes)) % 1440
+    except (AttributeError, ValueError):
+        return 0
+
+
+def archive_row(record):
+    phase_minutes = dict.fromkeys(PHASE_TYPES, 0)
+    phases = record.get('sleep_phases') or []
+    for phase in phases:
+        if phase.get('type') in phase_minutes:
+            phase_minutes[phase['type']] += phase.get('duration', 0)
+
+    return {
+        'date': datetime.strptime(record['date'], '%Y-%m-%d').toordinal(),
+        'start_minute': parse_minute(record.get('start_time')),
+        'duration': min(record['duration_hours'] * 60 + record['duration_minutes'], 0xFFFF),
+        'quality': max(0, min(record.get('quality_10', 5), 0xFF)),
+        'cycles': min(len(set(p.get('cycle', 0) for p in phases)), 0xFF),
+        **{t: min(m, 0xFFFF) for t, m in phase_minutes.items()}
+    }
+
+
+class SleepArchive:
+    def __init__(self, path='sleep_archive'):
+        self.path = path
+        self.maps = {}
+        self.views = {}
+        self.count = 0
+        self.open()
+
+    def column_path(self, name):
+        return os.path.join(self.path, f'{name}.col')
+
+    def open(self):
+        self.close()
+        os.makedirs(self.path, exist_ok=True)
+
+        sizes = {}
+        for name, typecode in COLUMNS:
+            path = self.column_path(name)
+            size = os.path.getsize(path) if os.path.exists(path) else 0
+            sizes[name] = size // array(typecode).itemsize
+        self.count = min(sizes.values())
+
+        for name, typecode in COLUMNS:
+            path = self.column_path(name)
+            itemsize = array(typecode).itemsize
+            if not os.path.exists(path):
+                open(path, 'wb').close()
+            if os.path.getsize(path) != self.count * itemsize:
+                with open(path, 'r+b') as f:
+                    f.truncate(self.count * itemsize)
+            if self.count:
+                with open(path, 'rb') as f:
+                    self.maps[name] = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+                self.views[name] = memoryview(self.maps[name]).cast(typecode)
+
+    def close(self):
+        for view in self.views.values():
+            view.release()
+        for mapped in self.maps.values():
+            mapped.close()
+        self.maps = {}
+        self.views = {}
+
+    def clear(self):
+        self.close()
+        for name, _ in COLUMNS:
+            open(self.column_path(name), 'wb').close()
+        self.open()
+
+    def __len__(self):
+        return self.count
+
+    def column(self, name):
+        return self.views.get(name, ())
+
+    def keys(self):
+        return set(zip(self.column('date'), self.column('start_minute'), self.column('duration')))
+
+    def append(self, records):
+        rows = []
+        for record in records:
+            try:
+                rows.append(archive_row(record))
+            except (KeyError, TypeError, ValueError):
+                continue
+
+        existing = self.keys()
+        rows = [r for r in rows if (r['date'], r['start_minute'], r['duration']) not in existing]
+        if not rows:
+            return 0
+
+        self.close()
+        for name, typecode in COLUMNS:
+            values = array(typecode, (row[name] for row in rows))
+            with open(self.column_path(name), 'ab') as f:
+                values.tofile(f)
+                f.flush()
+                os.fsync(f.fileno())
+        self.open()
+        return len(rows)
+
+    def select(self, date_from=None, date_to=None):
+        low = date_from.toordinal() if date_from else 0
+        high = date_to.toordinal() if date_to else sys.maxsize
+        return [i for i, day in enumerate(self.column('date')) if low <= day <= high]
+
+    def record(self, i):
+        start = self.views['start_minute'][i]
+        duration = self.views['duration'][i]
+        end = (start + duration) % 1440
+        return {
+            'date': date.fromordinal(self.views['date'][i]).isoformat(),
+            'start_time': f'{start // 60:02d}:{start % 60:02d}',
+            'end_time': f'{end // 60:02d}:{end % 60:02d}',
+            'duration_hours': duration // 60,
+            'duration_minutes': duration % 60,
+            'quality_10': self.views['quality'][i],
+            'cycles': self.views['cycles'][i],
+            'phase_minutes': {t: self.views[t][i] for t in PHASE_TYPES},
+            'archived': True
+        }
+
+    def summary(self, date_from=None, date_to=None):
+        if date_from is None and date_to is None:
+            count = self.count
+            total_minutes = sum(self.column('duration'))
+            total_quality = sum(self.column('quality'))
+        else:
+            indices = self.select(date_from, date_to)
+            count = len(indices)
+            total_minutes = sum(self.views['duration'][i] for i in indices)
+            total_quality = sum(self.views['quality'][i] for i in indices)
+        return {'count': count, 'total_minutes': total_minutes, 'total_quality': total_quality}
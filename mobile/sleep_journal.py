@@ -0,0 +1,150 @@
+import os
+import json
+
+from sleep_record import to_json
+
+
+def record_key(record):
+    return record.get('timestamp') or f"{record.get('date')} {record.get('start_time')} {record.get('end_time')}"
+
+
+class SleepJournal:
+    def __init__(self, snapshot_path='sleep_data.json', journal_path='sleep_data.journal', compact_every=50):
+        self.snapshot_path = snapshot_path
+        self.journal_path = journal_path
+        self.compact_every = compact_every
+        self.entries = 0
+
+    def load(self):
+        records = self.load_snapshot()
+        index = {record_key(r): i for i, r in enumerate(records)}
+        self.entries = 0
+
+        if not os.path.exists(self.journal_path):
+            return records
+
+        valid_size = 0
+        corrupt = []
+        with open(self.journal_path, 'rb') as f:
+            for line in f:
+                if not line.endswith(b'\n'):
+                    print("Отброшена недописанная запись журнала")
+                    break
+                valid_size += len(line)
+                try:
+                    records, index = self.apply(records, index, json.loads(line.decode('utf-8')))
+                except ValueError as e:
+                    print(f"Пропущена поврежденная запись журнала ({e}): {line[:50]!r}")
+                    corrupt.append(line)
+                    continue
+                self.entries += 1
+
+        if corrupt:
+            self.quarantine(corrupt)
+
+        if valid_size < os.path.getsize(self.journal_path):
+            with open(self.journal_path, 'r+b') as f:
+                f.truncate(valid_size)
+
+        return records
+
+    def load_snapshot(self):
+        if not os.path.exists(self.snapshot_path):
+            return []
+        try:
+            with open(self.snapshot_path, 'r', encoding='utf-8') as f:
+                records = json.load(f)
+            if not isinstance(records, list):
+                raise ValueError('ожидается список записей')
+            valid = [r for r in records if isinstance(r, dict)]
+            if len(valid) < len(records):
+                print(f"Пропущено некорректных записей в файле данных: {len(records) - len(valid)}")
+            return valid
+        except ValueError as e:
+            corrupt_path = self.snapshot_path + '.corrupt'
+            os.replace(self.snapshot_path, corrupt_path)
+            print(f"Файл данных поврежден ({e}), сохранен как {corrupt_path}")
+            return []
+
+    def quarantine(self, lines):
+        corrupt_path = self.journal_path + '.corrupt'
+        try:
+            known = set()
+            if os.path.exists(corrupt_path):
+                with open(corrupt_path, 'rb') as f:
+                    known = set(f)
+            with open(corrupt_path, 'ab') as f:
+                f.writelines(line for line in lines if line not in known)
+        except OSError as e:
+            print(f"Не удалось сохранить поврежденную запись журнала: {e}")
+
+    @staticmethod
+    def entry_record(entry):
+        record = entry.get('record')
+        if not isinstance(record, dict):
+            raise ValueError('нет записи')
+        return record
+
+    @staticmethod
+    def apply(records, index, entry):
+        if not isinstance(entry, dict):
+            raise ValueError('ожидается объект')
+        op = entry.get('op')
+        if op == 'append':
+            record = SleepJournal.entry_record(entry)
+            key = record_key(record)
+            if key not in index:
+                index[key] = len(records)
+                records.append(record)
+        elif op == 'update':
+            record = SleepJournal.entry_record(entry)
+            i = index.get(record_key(record))
+            if i is not None:
+                records[i] = record
+        elif op == 'delete':
+            keys = entry.get('keys')
+            if not isinstance(keys, list) or not all(isinstance(key, str) for key in keys):
+                raise ValueError('нет ключей')
+            keys = set(keys)
+            records = [r for r in records if record_key(r) not in keys]
+            index = {record_key(r): i for i, r in enumerate(records)}
+        elif op == 'clear':
+            records = []
+            index = {}
+        else:
+            raise ValueError(f'неизвестная операция {op!r}')
+        return records, index
+
+    def write(self, entry):
+        with open(self.journal_path, 'a', encoding='utf-8') as f:
+            f.write(json.dumps(entry, ensure_ascii=False, default=to_json) + '\n')
+            f.flush()
+            os.fsync(f.fileno())
+        self.entries += 1
+
+    def append(self, record):
+        self.write({'op': 'append', 'record': record})
+
+    def update(self, record):
+        self.write({'op': 'update', 'record': record})
+
+    def delete(self, records):
+        self.write({'op': 'delete', 'keys': [record_key(r) for r in records]})
+
+    def clear(self):
+        self.write({'op': 'clear'})
+
+    def should_compact(self):
+        return self.entries >= self.compact_every
+
+    def compact(self, records):
+        tmp_path = self.snapshot_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(records, f, indent=2, ensure_ascii=False, default=to_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.snapshot_path)
+
+        if os.path.exists(self.journal_path):
+            os.remove(self.journal_path)
+        self.entries = 0
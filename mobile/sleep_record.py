@@ -0,0 +1,182 @@
+from array import array
+
+PHASE_TYPES = ('light', 'medium', 'deep', 'rem')
+PHASE_CODES = {name: code for code, name in enumerate(PHASE_TYPES)}
+NO_CYCLE = 0xFF
+
+RECORD_FIELDS = (
+    'date', 'start_time', 'end_time', 'duration_hours', 'duration_minutes',
+    'quality_10', 'sleep_phases', 'phase_analysis', 'timestamp'
+)
+
+
+class Phase:
+    __slots__ = ('type', 'duration', 'cycle')
+
+    def __init__(self, type, duration, cycle=None):
+        self.type = type
+        self.duration = duration
+        self.cycle = cycle
+
+    def __getitem__(self, key):
+        if key == 'cycle' and self.cycle is None:
+            raise KeyError(key)
+        if key not in self.__slots__:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+    def to_dict(self):
+        phase = {'type': self.type, 'duration': self.duration}
+        if self.cycle is not None:
+            phase['cycle'] = self.cycle
+        return phase
+
+
+class PhaseList:
+    __slots__ = ('types', 'durations', 'cycles')
+
+    def __init__(self, phases=()):
+        self.types = array('B')
+        self.durations = array('H')
+        self.cycles = array('B')
+        for phase in phases:
+            self.append(phase)
+
+    def append(self, phase):
+        if isinstance(phase, Phase):
+            phase = phase.to_dict()
+        if set(phase) - {'type', 'duration', 'cycle'}:
+            raise ValueError(f"Неизвестные поля фазы: {sorted(set(phase) - {'type', 'duration', 'cycle'})}")
+
+        cycle = phase.get('cycle')
+        if type(phase['duration']) is not int or (cycle is not None and type(cycle) is not int):
+            raise ValueError("Длительность и цикл фазы должны быть целыми")
+        if cycle == NO_CYCLE:
+            raise ValueError(f"Номер цикла {cycle} не поддерживается")
+
+        code = PHASE_CODES.get(phase['type'])
+        if code is None:
+            raise ValueError(f"Неизвестный тип фазы: {phase['type']}")
+
+        try:
+            self.durations.append(phase['duration'])
+            self.cycles.append(NO_CYCLE if cycle is None else cycle)
+        except OverflowError:
+            del self.durations[len(self.types):]
+            raise ValueError("Значение фазы вне допустимого диапазона")
+        self.types.append(code)
+
+    def __len__(self):
+        return len(self.types)
+
+    def __bool__(self):
+        return len(self.types) > 0
+
+    def __getitem__(self, i):
+        cycle = self.cycles[i]
+        return Phase(PHASE_TYPES[self.types[i]], self.durations[i], None if cycle == NO_CYCLE else cycle)
+
+    def __iter__(self):
+        for i in range(len(self.types)):
+            yield self[i]
+
+    def to_dicts(self):
+        return [phase.to_dict() for phase in self]
+
+    def total_duration(self):
+        return sum(self.durations)
+
+    def distribution(self):
+        minutes = [0] * len(PHASE_TYPES)
+        present = [False] * len(PHASE_TYPES)
+        for code, duration in zip(self.types, self.durations):
+            minutes[code] += duration
+            present[code] = True
+        return {PHASE_TYPES[code]: minutes[code] for code in range(len(PHASE_TYPES)) if present[code]}
+
+    def cycle_count(self):
+        return len(set(0 if cycle == NO_CYCLE else cycle for cycle in self.cycles))
+
+
+class SleepRecord:
+    __slots__ = RECORD_FIELDS + ('extra',)
+
+    def __init__(self, **fields):
+        for name in RECORD_FIELDS:
+            setattr(self, name, None)
+        self.extra = None
+        for key, value in fields.items():
+            self[key] = value
+
+    @classmethod
+    def from_dict(cls, data):
+        return cls(**data)
+
+    def to_dict(self):
+        data = {}
+        for name in RECORD_FIELDS:
+            value = getattr(self, name)
+            if value is not None:
+                data[name] = value.to_dicts() if name == 'sleep_phases' else value
+        if self.extra:
+            data.update(self.extra)
+        return data
+
+    def __getitem__(self, key):
+        if key in RECORD_FIELDS and getattr(self, key) is not None:
+            return getattr(self, key)
+        if self.extra and key in self.extra:
+            return self.extra[key]
+        raise KeyError(key)
+
+    def __setitem__(self, key, value):
+        if key == 'sleep_phases' and value is not None and not isinstance(value, PhaseList):
+            value = PhaseList(value)
+        if key in RECORD_FIELDS:
+            setattr(self, key, value)
+            if value is not None:
+                if self.extra:
+                    self.extra.pop(key, None)
+                return
+        if self.extra is None:
+            self.extra = {}
+        self.extra[key] = value
+
+    def __contains__(self, key):
+        try:
+            self[key]
+        except KeyError:
+            return False
+        return True
+
+    def get(self, key, default=None):
+        try:
+            return self[key]
+        except KeyError:
+            return default
+
+
+def to_records(items):
+    records = []
+    for item in items:
+        if isinstance(item, dict):
+            try:
+                item = SleepRecord.from_dict(item)
+            except (KeyError, TypeError, ValueError):
+                pass
+        records.append(item)
+    return records
+
+
+def to_json(value):
+    if isinstance(value, (SleepRecord, Phase)):
+        return value.to_dict()
+    if isinstance(value, PhaseList):
+        return value.to_dicts()
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
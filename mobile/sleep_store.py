@@ -0,0 +1,73 @@
+import bisect
+
+
+def record_minutes(record):
+    return record['duration_hours'] * 60 + record['duration_minutes']
+
+
+def record_quality(record):
+    if 'quality_10' in record:
+        return record['quality_10']
+    elif 'quality' in record:
+        return record['quality'] * 2
+    return None
+
+
+class DayTotals:
+    __slots__ = ('count', 'hours', 'minutes', 'quality_10', 'quality')
+
+    def __init__(self):
+        self.count = 0
+        self.hours = 0
+        self.minutes = 0
+        self.quality_10 = 0
+        self.quality = 0
+
+    def add(self, record):
+        quality = record_quality(record)
+        self.count += 1
+        self.hours += record['duration_hours']
+        self.minutes += record['duration_minutes']
+        self.quality_10 += record.get('quality_10', 5)
+        self.quality += quality or 0
+
+    @property
+    def total_minutes(self):
+        return self.hours * 60 + self.minutes
+
+
+class SleepStore:
+    def __init__(self, records=()):
+        self.records = []
+        self.daily = {}
+        self.timestamps = []
+        self.by_timestamp = []
+        self.totals = DayTotals()
+        for record in records:
+            self.append(record)
+
+    def __len__(self):
+        return len(self.records)
+
+    def __bool__(self):
+        return bool(self.records)
+
+    def append(self, record):
+        self.records.append(record)
+        date = record.get('date')
+        self.daily.setdefault(date, DayTotals()).add(record)
+        self.totals.add(record)
+
+        timestamp = record.get('timestamp', '')
+        i = bisect.bisect_right(self.timestamps, timestamp)
+        self.timestamps.insert(i, timestamp)
+        self.by_timestamp.insert(i, record)
+
+    def clear(self):
+        self.__init__()
+
+    def day_totals(self, date):
+        return self.daily.get(date)
+
+    def recent(self, count):
+        return self.by_timestamp[:-count - 1:-1] if count > 0 else []
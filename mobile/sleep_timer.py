@@ -0,0 +1,75 @@
+import os
+import json
+import time
+from datetime import datetime
+
+CLOCK_TOLERANCE_SECONDS = 300
+
+
+def boot_clock():
+    if hasattr(time, 'CLOCK_BOOTTIME'):
+        return time.clock_gettime(time.CLOCK_BOOTTIME)
+    return time.monotonic()
+
+
+class SleepTimer:
+    def __init__(self, state_path='tracking_state.json'):
+        self.state_path = state_path
+        self.start_time = None
+        self.start_clock = None
+
+    def start(self):
+        self.start_time = datetime.now()
+        self.start_clock = boot_clock()
+
+    def stop(self):
+        elapsed = self.elapsed()
+        self.start_time = None
+        self.start_clock = None
+        return elapsed
+
+    def elapsed(self):
+        if self.start_time is None:
+            return 0
+        if self.start_clock is not None:
+            return max(0, int(boot_clock() - self.start_clock))
+        return max(0, int((datetime.now() - self.start_time).total_seconds()))
+
+    def state(self):
+        if self.start_time is None:
+            return None
+        return {'start_time': self.start_time.isoformat(), 'start_clock': self.start_clock}
+
+    def save(self, state):
+        if state is None:
+            if os.path.exists(self.state_path):
+                os.remove(self.state_path)
+            return
+
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(state, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def restore(self):
+        try:
+            with open(self.state_path, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+            start_time = datetime.fromisoformat(state['start_time'])
+        except FileNotFoundError:
+            return False
+        except (ValueError, KeyError, TypeError) as e:
+            print(f"Ошибка восстановления отслеживания: {e}")
+            return False
+
+        self.start_time = start_time
+        self.start_clock = state.get('start_clock')
+
+        if self.start_clock is not None:
+            wall_elapsed = (datetime.now() - start_time).total_seconds()
+            clock_elapsed = boot_clock() - self.start_clock
+            if clock_elapsed < 0 or abs(clock_elapsed - wall_elapsed) > CLOCK_TOLERANCE_SECONDS:
+                self.start_clock = None
+        return True
@@ -0,0 +1,112 @@
+import os
+import gzip
+import json
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.util.retry import Retry
+
+from sleep_record import to_json
+
+BATCH_SIZE = 200
+SYNC_INTERVAL = 300
+
+
+class SyncClient:
+    def __init__(self, base_url, user_id=1, state_path='sync_state.json', batch_size=BATCH_SIZE, timeout=15):
+        self.url = base_url.rstrip('/') + '/api/sync'
+        self.user_id = user_id
+        self.state_path = state_path
+        self.batch_size = batch_size
+        self.timeout = timeout
+        self.session = None
+        self.state = self.load_state()
+
+    def load_state(self):
+        state = {'device_id': uuid.uuid4().hex, 'cursor': 0, 'outbox': [], 'backfilled': False}
+        if os.path.exists(self.state_path):
+            try:
+                with open(self.state_path, 'r', encoding='utf-8') as f:
+                    state.update(json.load(f))
+            except (OSError, ValueError) as e:
+                print(f"Ошибка чтения состояния синхронизации: {e}")
+        return state
+
+    def save_state(self):
+        tmp_path = self.state_path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(self.state, f, ensure_ascii=False, default=to_json)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, self.state_path)
+
+    def enqueue(self, records):
+        queued = set(r.get('timestamp') for r in self.state['outbox'])
+        for record in records:
+            record = record.to_dict() if hasattr(record, 'to_dict') else dict(record)
+            if record.get('timestamp') and record['timestamp'] not in queued:
+                queued.add(record['timestamp'])
+                self.state['outbox'].append(record)
+        self.save_state()
+
+    def clear_outbox(self):
+        self.state['outbox'] = []
+        self.save_state()
+
+    def backfill(self, records):
+        if self.state['backfilled']:
+            return
+        self.state['backfilled'] = True
+        self.enqueue(records)
+
+    def get_session(self):
+        if self.session is None:
+            retry = Retry(total=3, backoff_factor=0.5, status_forcelist=(502, 503, 504),
+                          allowed_methods=frozenset(['POST']))
+            self.session = requests.Session()
+            self.session.mount('http://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+            self.session.mount('https://', HTTPAdapter(pool_connections=1, pool_maxsize=2, max_retries=retry))
+        return self.session
+
+    def post(self, records):
+        body = json.dumps({
+            'device_id': self.state['device_id'],
+            'user_id': self.user_id,
+            'cursor': self.state['cursor'],
+            'records': records
+        }, ensure_ascii=False, default=to_json).encode('utf-8')
+
+        response = self.get_session().post(
+            self.url,
+            data=gzip.compress(body),
+            headers={'Content-Type': 'application/json', 'Content-Encoding': 'gzip'},
+            timeout=self.timeout
+        )
+        response.raise_for_status()
+        return response.json()
+
+    def sync(self):
+        received = []
+        prefix = self.state['device_id'] + ':'
+
+        while True:
+            batch = self.state['outbox'][:self.batch_size]
+            result = self.post(batch)
+
+            done = set(key[len(prefix):] for key in result['accepted'] if key.startswith(prefix))
+            for rejected in result['rejected']:
+                print(f"Запись отклонена сервером: {rejected.get('message')}")
+                if 'key' in rejected and rejected['key'].startswith(prefix):
+                    done.add(rejected['key'][len(prefix):])
+                elif 'index' in rejected:
+                    done.add(batch[rejected['index']].get('timestamp'))
+
+            self.state['outbox'] = [r for r in self.state['outbox'] if r.get('timestamp') not in done]
+            self.state['cursor'] = result['cursor']
+            self.save_state()
+            received.extend(result['records'])
+
+            sent_all = not self.state['outbox'] or not done
+            if sent_all and not result['more']:
+                return received
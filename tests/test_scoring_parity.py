@@ -0,0 +1,80 @@
+import os
+import random
+import sys
+from datetime import datetime, timedelta
+
+ROOT_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'backend'))
+sys.path.insert(0, os.path.join(ROOT_DIR, 'mobile'))
+sys.path.insert(0, ROOT_DIR)
+
+os.environ['SLEEP_STORAGE'] = 'memory'
+
+import app_simple
+from common import vectorized
+from serialization import dumps
+from sleep_analysis import SleepPhaseAnalyzer
+
+SCREEN_TIMES = (0, -5, 1, 90, 120, 121, 150.5, 399, 400, 1000)
+
+
+def sleep_items(count, rng):
+    base = datetime(2030, 1, 1, 22, 0)
+    for i in range(count):
+        start = base + timedelta(days=i, minutes=rng.randint(-120, 120))
+        end = start + timedelta(minutes=rng.randint(30, 720))
+        yield {
+            'user_id': rng.randint(1, 5),
+            'start_time': start.isoformat() + rng.choice(('', 'Z', '+03:00')),
+            'end_time': end.isoformat() + rng.choice(('', 'Z', '+03:00')),
+            'digital_habits': {
+                'screen_time_minutes': rng.choice(SCREEN_TIMES),
+                'social_media_minutes': rng.randint(0, 200),
+                'gaming_minutes': rng.randint(0, 200)
+            }
+        }
+
+
+def stored(record_id):
+    record = dict(app_simple.storage.get(record_id))
+    del record['id'], record['user_id'], record['timestamp']
+    return dumps(record)
+
+
+def test_single_and_batch_store_identical_json():
+    rng = random.Random(5)
+    items = list(sleep_items(400, rng))
+    client = app_simple.app.test_client()
+
+    single = []
+    for item in items:
+        response = client.post('/api/sleep', json=item)
+        single.append(response.get_json().get('record_id'))
+
+    batch = client.post('/api/sleep/batch', json=[dict(item, user_id=item['user_id'] + 100) for item in items])
+    batch_ids = [result.get('record_id') for result in batch.get_json()['results']]
+
+    for item, single_id, batch_id in zip(items, single, batch_ids):
+        assert (single_id is None) == (batch_id is None), item
+        if single_id is None:
+            continue
+        assert stored(batch_id) == stored(single_id), item
+
+
+def test_phase_columns_match_analyze_phases():
+    random.seed(7)
+    phase_lists = [SleepPhaseAnalyzer.generate_sleep_phases(minutes) for minutes in range(0, 721, 3)]
+
+    minutes, totals, cycles = vectorized.phase_columns(phase_lists)
+    deep = minutes[:, vectorized.PHASE_TYPES.index('deep')]
+    rem = minutes[:, vectorized.PHASE_TYPES.index('rem')]
+    scores = vectorized.score_phases(totals, deep, rem, cycles)
+
+    for i, phases in enumerate(phase_lists):
+        expected = SleepPhaseAnalyzer.analyze_phases(phases)
+        assert int(scores['total_score'][i]) == expected['total_score']
+        assert vectorized.phase_analysis(int(scores['flags'][i]), int(cycles[i])) == expected['analysis']
+        assert int(totals[i]) == expected['total_duration']
+        assert int(deep[i]) == expected['deep_sleep']
+        assert int(rem[i]) == expected['rem_sleep']
+        assert int(cycles[i]) == expected['cycles']